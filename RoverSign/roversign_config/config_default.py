@@ -79,6 +79,112 @@ CONFIG_DEFAULT: Dict[str, GSC] = {
         options=[
             "all",
             "do_sign_in",
+            "do_like",
+            "do_post_detail",
+            "do_share",
+            "get_task",
+            "get_form_list",
+            "sign_in",
+            "sign_in_task_list",
+            "login_log",
+            "refresh_data",
+            "get_request_token",
+            "get_daily_info",
         ],
     ),
+    "HttpPoolLimit": GsIntConfig(
+        "HTTP连接池总连接数（重启生效）",
+        "HTTP连接池总连接数（重启生效）",
+        100,
+        max_value=1000,
+    ),
+    "HttpPoolLimitPerHost": GsIntConfig(
+        "HTTP连接池单域名连接数（重启生效）",
+        "HTTP连接池单域名连接数（重启生效）",
+        20,
+        max_value=200,
+    ),
+    "HttpKeepAliveTimeout": GsIntConfig(
+        "HTTP长连接保持时间（秒）",
+        "HTTP长连接空闲多久后关闭（秒）",
+        60,
+        max_value=600,
+    ),
+    "TokenHealthTTL": GsIntConfig(
+        "Token校验缓存时间（秒）",
+        "Token校验或签到前刷新bat成功后多久内跳过登录校验，0为每次都校验",
+        14400,
+        max_value=86400,
+    ),
+    "BatTokenPrefresh": GsBoolConfig(
+        "签到前刷新bat令牌",
+        "自动签到前30分钟刷新过旧的bat令牌",
+        True,
+    ),
+    "BatTokenMaxAge": GsIntConfig(
+        "bat令牌刷新间隔（小时）",
+        "bat令牌获取超过该时长后，签到前提前刷新",
+        24,
+        max_value=168,
+    ),
+    "SigninAdaptive": GsBoolConfig(
+        "自动签到自适应并发",
+        "根据接口延迟与繁忙/风控返回自动调整并发数与签到间隔",
+        False,
+    ),
+    "SigninConcurrentMin": GsIntConfig(
+        "自适应并发下限", "自适应并发时的最小并发数量", 1, max_value=50
+    ),
+    "SigninConcurrentMax": GsIntConfig(
+        "自适应并发上限", "自适应并发时的最大并发数量", 5, max_value=50
+    ),
+    "RateLimitEndpoint": GsListStrConfig(
+        "接口限速（次/分钟）",
+        "格式为 接口名:次数，default 为未单独配置的接口，不填则不限速",
+        [
+            "default:300",
+            "sign_in:60",
+            "do_sign_in:60",
+            "do_post_detail:120",
+            "do_like:120",
+            "do_share:60",
+        ],
+    ),
+    "RateLimitPerEgress": GsIntConfig(
+        "单出口限速（次/分钟）",
+        "每个出口代理的总请求数限制，0为不限速",
+        0,
+        max_value=6000,
+    ),
+    "RateLimitPerAccount": GsIntConfig(
+        "单账号限速（次/分钟）",
+        "自动签到时每个账号的请求数限制，0为不限速",
+        40,
+        max_value=600,
+    ),
+    "RateLimitAccountBurst": GsIntConfig(
+        "单账号突发请求数", "单账号限速允许的突发请求数", 2, max_value=100
+    ),
+    "BBSPostForums": GsListStrConfig(
+        "社区任务帖子来源版块",
+        "浏览/点赞任务从这些版块ID拉取帖子",
+        ["9"],
+    ),
+    "BBSPostPages": GsIntConfig(
+        "社区任务帖子拉取页数", "每个版块拉取的页数，每页20个帖子", 3, max_value=10
+    ),
+    "BBSTaskConcurrency": GsIntConfig(
+        "社区任务账号内并发数",
+        "单个账号的签到、分享、浏览、点赞同时执行的数量",
+        2,
+        max_value=4,
+    ),
+    "SignWindow": GsBoolConfig(
+        "自动签到窗口模式",
+        "将账号按固定时刻分散到签到时间后的一段窗口内执行，窗口结束后补跑未完成的账号",
+        False,
+    ),
+    "SignWindowMinutes": GsIntConfig(
+        "自动签到窗口时长（分钟）", "窗口模式下分散执行的时长", 180, max_value=720
+    ),
 }
@@ -1,3 +1,5 @@
+import time
+
 from gsuid_core.aps import scheduler
 from gsuid_core.bot import Bot
 from gsuid_core.logger import logger
@@ -6,16 +8,24 @@ from gsuid_core.subscribe import gs_subscribe
 from gsuid_core.sv import SV
 
 from ..roversign_config.roversign_config import RoverSignConfig
+from ..utils.bat_token import BAT_PREFRESH_LEAD
 from ..utils.constant import BoardcastTypeEnum
-from ..utils.database.models import RoverSign
+from ..utils.database.models import RoverSign, RoverSignOutbox, RoverSignRun
 from ..utils.util import get_two_days_ago_date
-from .new_sign import rover_auto_sign_task, rover_sign_up_handler
+from .new_sign import (
+    rover_auto_sign_task,
+    rover_bat_prefresh_task,
+    rover_sign_up_handler,
+)
 
 sv_waves_sign = SV("RoverSign-签到", priority=1)
 waves_sign_all = SV("RoverSign-全部签到", pm=1)
 
 # 签到时间
 SIGN_TIME = RoverSignConfig.get_config("SignTime").data
+_bat_prefresh_minute = (
+    int(SIGN_TIME[0]) * 60 + int(SIGN_TIME[1]) - BAT_PREFRESH_LEAD
+) % 1440
 
 
 @sv_waves_sign.on_fullmatch(
@@ -44,6 +54,15 @@ async def rover_auto_sign():
             await sub.send(msg)
 
 
+@scheduler.scheduled_job(
+    "cron", hour=_bat_prefresh_minute // 60, minute=_bat_prefresh_minute % 60
+)
+async def rover_bat_prefresh():
+    if not RoverSignConfig.get_config("BatTokenPrefresh").data:
+        return
+    await rover_bat_prefresh_task()
+
+
 @waves_sign_all.on_fullmatch(("全部签到"))
 async def rover_sign_recheck_all(bot: Bot, ev: Event):
     await bot.send("[RoverSign] [全部签到] 已开始执行!")
@@ -75,4 +94,6 @@ async def rover_sign_result(bot: Bot, ev: Event):
 async def clear_sign_record():
     """清除2天前的签到记录"""
     await RoverSign.clear_sign_record(get_two_days_ago_date())
+    await RoverSignOutbox.clear_outbox(int(time.time()) - 2 * 86400)
+    await RoverSignRun.clear_run(get_two_days_ago_date())
     logger.info("[RoverSign] [清除签到记录] 已清除2天前的签到记录!")
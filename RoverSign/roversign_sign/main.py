@@ -1,6 +1,6 @@
-import asyncio
 import random
-from typing import Dict, Union
+from functools import lru_cache, partial
+from typing import Awaitable, Callable, Dict, Optional, Union
 
 from PIL import Image, ImageDraw
 
@@ -8,10 +8,23 @@ from gsuid_core.logger import logger
 from gsuid_core.segment import MessageSegment
 
 from ..roversign_config.roversign_config import RoverSignConfig
+from ..utils.api.pacer import pacer_sleep
+from ..utils.api.request_util import KuroApiResp, RespCode
 from ..utils.database.models import RoverSign, RoverSignData
+from ..utils.database.sign_buffer import sign_buffer
 from ..utils.database.states import SignStatus
+from ..utils.errors import ROVER_CODE_999
 from ..utils.fonts.waves_fonts import waves_font_24
 from ..utils.rover_api import rover_api
+from .post_pool import post_pool
+from .task_graph import TaskGraph
+
+# 单个浏览/点赞任务最多尝试的帖子数 = 需要次数 * POST_RETRY_FACTOR
+POST_RETRY_FACTOR = 3
+
+# 单账号内帖子之间、社区任务之间的随机间隔（秒）
+POST_GAP = (0, 1)
+TASK_GAP = (0, 1)
 
 
 async def get_sign_interval(is_bbs: bool = False):
@@ -47,11 +60,56 @@ async def do_sign_in(taskData, uid, token, rover_sign: RoverSignData):
     return False
 
 
+# 帖子已删除/不存在时的返回信息，只有这类失败才换帖子重试
+POST_GONE_MSGS = ("不存在", "已删除", "已被删除")
+
+
+def is_post_gone(res: Optional[KuroApiResp]) -> bool:
+    """帖子本身失效；风控、繁忙等其他失败换帖子也无济于事，不能当作帖子失效"""
+    if res is None or res.code in (ROVER_CODE_999, RespCode.DANGER_ENV.value):
+        return False
+    if res.is_token_invalid or res.is_bat_token_invalid:
+        return False
+    return isinstance(res.msg, str) and any(m in res.msg for m in POST_GONE_MSGS)
+
+
+async def run_post_action(
+    need: int,
+    action: Callable[[Dict], Awaitable[Optional[KuroApiResp]]],
+    on_success: Callable[[], None],
+) -> bool:
+    """
+    从帖子池依次取帖子执行浏览/点赞，账号内的并发由 TaskGraph 控制
+    帖子已删除/不存在时换一个继续，其他失败直接中止
+    """
+    succ = 0
+    tried = 0
+    while succ < need and tried < need * POST_RETRY_FACTOR:
+        post = post_pool.draw()
+        if post is None:
+            break
+        if tried:
+            # 帖子之间保留随机间隔，等待时交出执行槽位
+            await pacer_sleep(random.uniform(*POST_GAP))
+        tried += 1
+
+        res = await action(post)
+        if res and res.code == 200:
+            succ += 1
+            on_success()
+        elif is_post_gone(res):
+            # 帖子失效，移出帖子池后换一个继续
+            post_pool.discard(post)
+        else:
+            # 风控、繁忙等失败直接中止，不再继续请求也不动帖子池
+            break
+    return succ >= need
+
+
 async def do_detail(
     taskData,
     uid,
     token,
-    post_list,
     rover_sign: RoverSignData,
 ):
     if (
@@ -60,26 +118,20 @@ async def do_detail(
     ):
         rover_sign.bbs_detail = SignStatus.BBS_DETAIL
         return True
+
     # 浏览帖子
-    detail_succ = 0
-    for i, post in enumerate(post_list):
-        post_detail_res = await rover_api.do_post_detail(uid, token, post["postId"])
-        if not post_detail_res or not post_detail_res.success:
-            break
-        if post_detail_res.code == 200:
-            detail_succ += 1
-            # 浏览成功
-            rover_sign.bbs_detail = (
-                rover_sign.bbs_detail + 1 if rover_sign.bbs_detail else 1
-            )
-        else:
-            # 浏览失败
-            break
-        if detail_succ >= taskData["needActionTimes"] - taskData["completeTimes"]:
-            rover_sign.bbs_detail = SignStatus.BBS_DETAIL
-            return True
+    def on_success():
+        rover_sign.bbs_detail = (
+            rover_sign.bbs_detail + 1 if rover_sign.bbs_detail else 1
+        )
 
-        await asyncio.sleep(random.uniform(0, 1))
+    if await run_post_action(
+        taskData["needActionTimes"] - taskData["completeTimes"],
+        lambda post: rover_api.do_post_detail(uid, token, post["postId"]),
+        on_success,
+    ):
+        rover_sign.bbs_detail = SignStatus.BBS_DETAIL
+        return True
 
     logger.warning(f"[鸣潮][社区签到]浏览失败 uid: {uid}")
     return False
@@ -89,7 +141,6 @@ async def do_like(
     taskData,
     uid,
     token,
-    post_list,
     rover_sign: RoverSignData,
 ):
     if (
@@ -100,23 +151,16 @@ async def do_like(
         return True
 
     # 用户点赞5次
-    like_succ = 0
-    for i, post in enumerate(post_list):
-        like_res = await rover_api.do_like(uid, token, post["postId"], post["userId"])
-        if not like_res or not like_res.success:
-            break
-        if like_res.code == 200:
-            like_succ += 1
-            # 点赞成功
-            rover_sign.bbs_like = rover_sign.bbs_like + 1 if rover_sign.bbs_like else 1
-        else:
-            # 点赞失败
-            break
-        if like_succ >= taskData["needActionTimes"] - taskData["completeTimes"]:
-            rover_sign.bbs_like = SignStatus.BBS_LIKE
-            return True
+    def on_success():
+        rover_sign.bbs_like = rover_sign.bbs_like + 1 if rover_sign.bbs_like else 1
 
-        await asyncio.sleep(random.uniform(0, 1))
+    if await run_post_action(
+        taskData["needActionTimes"] - taskData["completeTimes"],
+        lambda post: rover_api.do_like(uid, token, post["postId"], post["userId"]),
+        on_success,
+    ):
+        rover_sign.bbs_like = SignStatus.BBS_LIKE
+        return True
 
     logger.warning(f"[鸣潮][社区签到]点赞失败 uid: {uid}")
     return False
@@ -148,8 +192,12 @@ async def do_share(
     return False
 
 
-async def do_single_task(uid, token) -> Union[bool, Dict[str, bool]]:
-    rover_sign = await RoverSign.get_sign_data(uid)
+async def do_single_task(
+    uid, token, rover_sign: Optional[Union[RoverSign, RoverSignData]] = None
+) -> Union[bool, Dict[str, bool]]:
+    # rover_sign 可由调用方预取传入，避免逐个查询
+    if not rover_sign:
+        rover_sign = await sign_buffer.get_sign_data(uid)
     if not rover_sign:
         rover_sign = RoverSignData.build_bbs_sign(uid)
 
@@ -178,97 +226,66 @@ async def do_single_task(uid, token) -> Union[bool, Dict[str, bool]]:
             rover_sign.bbs_share = SignStatus.BBS_SHARE
             is_save = True
         if is_save:
-            await RoverSign.upsert_rover_sign(rover_sign)
+            await sign_buffer.put(rover_sign)
         return True
 
-    # check 1
-    need_post_list_flag = False
-    for i in task_res.data["dailyTask"]:
-        if i["completeTimes"] == i["needActionTimes"]:
-            continue
-        if "签到" not in i["remark"] or "分享" not in i["remark"]:
-            need_post_list_flag = True
-
-    post_list = []
-    if need_post_list_flag:
-        # 获取帖子
-        form_list_res = await rover_api.get_form_list(token)
-        if not form_list_res or not form_list_res.success:
-            return False
-        if form_list_res.data and isinstance(form_list_res.data, dict):
-            # 获取到帖子列表
-            post_list = form_list_res.data["postList"]
-            random.shuffle(post_list)
-        if not post_list:
-            logger.exception(
-                f"[鸣潮][社区签到]获取帖子列表失败 uid: {uid} res: {form_list_res}"
-            )
-            # 未获取帖子列表
-            return False
-
-    form_result = {
-        "用户签到": False,
-        "浏览帖子": False,
-        "点赞帖子": False,
-        "分享帖子": False,
-    }
-
-    # 随机打乱任务列表
-    random.shuffle(task_res.data["dailyTask"])
+    # 签到、分享、浏览、点赞互不依赖，浏览、点赞依赖帖子池
+    concurrency: int = RoverSignConfig.get_config("BBSTaskConcurrency").data
+    graph = TaskGraph(concurrency, TASK_GAP)
+    post_deps = []
+    if any(
+        i["completeTimes"] != i["needActionTimes"]
+        and ("浏览" in i["remark"] or "点赞" in i["remark"])
+        for i in task_res.data["dailyTask"]
+    ):
+        # 帖子池每次执行只刷新一次
+        graph.add("帖子列表", lambda: post_pool.ensure(token))
+        post_deps.append("帖子列表")
 
-    # 获取到任务列表
     for i in task_res.data["dailyTask"]:
         if "签到" in i["remark"]:
-            form_result["用户签到"] = await do_sign_in(i, uid, token, rover_sign)
+            graph.add("用户签到", partial(do_sign_in, i, uid, token, rover_sign))
         elif "浏览" in i["remark"]:
-            form_result["浏览帖子"] = await do_detail(
-                i, uid, token, post_list, rover_sign
+            graph.add(
+                "浏览帖子",
+                partial(do_detail, i, uid, token, rover_sign),
+                post_deps,
             )
         elif "点赞" in i["remark"]:
-            form_result["点赞帖子"] = await do_like(
-                i, uid, token, post_list, rover_sign
+            graph.add(
+                "点赞帖子",
+                partial(do_like, i, uid, token, rover_sign),
+                post_deps,
             )
         elif "分享" in i["remark"]:
-            form_result["分享帖子"] = await do_share(i, uid, token, rover_sign)
+            graph.add("分享帖子", partial(do_share, i, uid, token, rover_sign))
+
+    results = await graph.run()
+    if post_deps and not results["帖子列表"]:
+        # 未获取帖子列表
+        logger.warning(f"[鸣潮][社区签到]获取帖子列表失败 uid: {uid}")
 
-        await asyncio.sleep(random.uniform(0, 1))
+    form_result = {
+        name: bool(results.get(name, False))
+        for name in ("用户签到", "浏览帖子", "点赞帖子", "分享帖子")
+    }
 
-    await RoverSign.upsert_rover_sign(rover_sign)
+    await sign_buffer.put(rover_sign)
 
     return form_result
 
 
-async def single_task(
+def add_sign_report(
     bot_id: str,
     uid: str,
     gid: str,
     qid: str,
-    ck: str,
+    im: str,
     private_msgs: Dict,
     group_msgs: Dict,
     all_msgs: Dict,
 ):
-    im = await do_single_task(uid, ck)
-    if isinstance(im, dict):
-        msg = []
-        msg.append(f"特征码: {uid}")
-        for i, r in im.items():
-            if r:
-                msg.append(f"{i}: 成功")
-            else:
-                msg.append(f"{i}: 失败")
-
-        im = "\n".join(msg)
-    elif isinstance(im, bool):
-        if im:
-            im = "社区签到成功"
-        else:
-            im = "社区签到失败"
-    else:
-        return
-
-    logger.debug(f"[鸣潮][社区签到]签到结果 uid: {uid} res: {im}")
-
+    """把单个账号的签到结果计入私聊/群聊报告"""
     if gid == "on":
         if qid not in private_msgs:
             private_msgs[qid] = []
@@ -309,7 +326,7 @@ async def single_task(
             group_msgs[gid]["success"] += 1
 
 
-async def single_daily_sign(
+async def single_task(
     bot_id: str,
     uid: str,
     gid: str,
@@ -318,45 +335,46 @@ async def single_daily_sign(
     private_msgs: Dict,
     group_msgs: Dict,
     all_msgs: Dict,
+    rover_sign: Optional[Union[RoverSign, RoverSignData]] = None,
 ):
-    im = await sign_in(uid, ck)
-    if gid == "on":
-        if qid not in private_msgs:
-            private_msgs[qid] = []
-        private_msgs[qid].append(
-            {"bot_id": bot_id, "uid": uid, "msg": [MessageSegment.text(im)]}
-        )
-        if "失败" in im:
-            all_msgs["failed"] += 1
-        else:
-            all_msgs["success"] += 1
-    elif gid == "off":
-        if "失败" in im:
-            all_msgs["failed"] += 1
+    im = await do_single_task(uid, ck, rover_sign)
+    if isinstance(im, dict):
+        msg = []
+        msg.append(f"特征码: {uid}")
+        for i, r in im.items():
+            if r:
+                msg.append(f"{i}: 成功")
+            else:
+                msg.append(f"{i}: 失败")
+
+        im = "\n".join(msg)
+    elif isinstance(im, bool):
+        if im:
+            im = "社区签到成功"
         else:
-            all_msgs["success"] += 1
+            im = "社区签到失败"
     else:
-        # 向群消息推送列表添加这个群
-        if gid not in group_msgs:
-            group_msgs[gid] = {
-                "bot_id": bot_id,
-                "success": 0,
-                "failed": 0,
-                "push_message": [],
-            }
-        if "失败" in im:
-            all_msgs["failed"] += 1
-            group_msgs[gid]["failed"] += 1
-            group_msgs[gid]["push_message"].extend(
-                [
-                    MessageSegment.text("\n"),
-                    MessageSegment.at(qid),
-                    MessageSegment.text(im),
-                ]
-            )
-        else:
-            all_msgs["success"] += 1
-            group_msgs[gid]["success"] += 1
+        return
+
+    logger.debug(f"[鸣潮][社区签到]签到结果 uid: {uid} res: {im}")
+
+    add_sign_report(bot_id, uid, gid, qid, im, private_msgs, group_msgs, all_msgs)
+    return im
+
+
+async def single_daily_sign(
+    bot_id: str,
+    uid: str,
+    gid: str,
+    qid: str,
+    ck: str,
+    private_msgs: Dict,
+    group_msgs: Dict,
+    all_msgs: Dict,
+):
+    im = await sign_in(uid, ck)
+    add_sign_report(bot_id, uid, gid, qid, im, private_msgs, group_msgs, all_msgs)
+    return im
 
 
 async def sign_in(uid: str, ck: str, isForce: bool = False) -> str:
@@ -369,18 +387,18 @@ async def sign_in(uid: str, ck: str, isForce: bool = False) -> str:
 
         if hasSignIn:
             # 已经签到
-            await RoverSign.upsert_rover_sign(RoverSignData.build_game_sign(uid))
+            await sign_buffer.put(RoverSignData.build_game_sign(uid))
             logger.debug(f"UID{uid} 该用户今日已签到,跳过...")
             return "今日已签到！请勿重复签到！"
 
     sign_in_res = await rover_api.sign_in(uid, ck)
     if sign_in_res.success:
         # 签到成功
-        await RoverSign.upsert_rover_sign(RoverSignData.build_game_sign(uid))
+        await sign_buffer.put(RoverSignData.build_game_sign(uid))
         return "签到成功！"
     elif sign_in_res.code == 1511:
         # 已经签到
-        await RoverSign.upsert_rover_sign(RoverSignData.build_game_sign(uid))
+        await sign_buffer.put(RoverSignData.build_game_sign(uid))
         logger.debug(f"UID{uid} 该用户今日已签到,跳过...")
         return "今日已签到！请勿重复签到！"
 
@@ -394,55 +412,54 @@ def create_gradient_background(width, height, start_color, end_color=(255, 255,
     start_color: 起始颜色，如 (230, 230, 255) 浅蓝
     end_color: 结束颜色，默认白色
     """
-    # 创建新图像
-    image = Image.new("RGB", (width, height))
+    # 纵向 0-255 的灰度蒙版，拉伸后一次性合成，避免逐像素绘制
+    mask = Image.linear_gradient("L").resize((width, height))
+    start = Image.new("RGB", (width, height), start_color)
+    end = Image.new("RGB", (width, height), end_color)
+    return Image.composite(end, start, mask)
+
+
+SIGN_INFO_WIDTH = 600
+SIGN_INFO_HEIGHT = 250  # 稍微减小高度使布局更紧凑
 
-    for y in range(height):
-        # 计算当前行的颜色比例
-        ratio = y / height
+# 预定义主题颜色
+SIGN_INFO_THEMES = {
+    "blue": (230, 230, 255),  # 浅蓝
+    "yellow": (255, 255, 230),  # 浅黄
+    "pink": (255, 230, 230),  # 浅粉
+    "green": (230, 255, 230),  # 浅绿
+}
 
-        # 计算当前行的 RGB 值
-        r = int(end_color[0] * ratio + start_color[0] * (1 - ratio))
-        g = int(end_color[1] * ratio + start_color[1] * (1 - ratio))
-        b = int(end_color[2] * ratio + start_color[2] * (1 - ratio))
 
-        # 创建当前行的颜色
-        line_color = (r, g, b)
-        # 绘制当前行
-        for x in range(width):
-            image.putpixel((x, y), line_color)
+@lru_cache(maxsize=None)
+def get_sign_info_bg(theme: str) -> Image.Image:
+    """每个主题的渐变背景和边框只绘制一次"""
+    width = SIGN_INFO_WIDTH
+    height = SIGN_INFO_HEIGHT
 
-    return image
+    # 创建渐变背景
+    img = create_gradient_background(width, height, SIGN_INFO_THEMES[theme])
+    draw = ImageDraw.Draw(img)
+
+    # 绘制装饰边框
+    border_color = (200, 200, 200)
+    draw.rectangle([(10, 10), (width - 10, height - 10)], outline=border_color, width=2)
+    return img
 
 
 def create_sign_info_image(text, theme="blue"):
     text = text[1:]
-    # 创建图片
-    width = 600
-    height = 250  # 稍微减小高度使布局更紧凑
-
-    # 预定义主题颜色
-    themes = {
-        "blue": (230, 230, 255),  # 浅蓝
-        "yellow": (255, 255, 230),  # 浅黄
-        "pink": (255, 230, 230),  # 浅粉
-        "green": (230, 255, 230),  # 浅绿
-    }
 
     # 获取主题颜色，默认浅蓝
-    start_color = themes.get(theme, themes["blue"])
+    if theme not in SIGN_INFO_THEMES:
+        theme = "blue"
 
-    # 创建渐变背景
-    img = create_gradient_background(width, height, start_color)
+    img = get_sign_info_bg(theme).copy()
     draw = ImageDraw.Draw(img)
 
     # 颜色定义
     title_color = (51, 51, 51)  # 标题色
 
-    # 绘制装饰边框
-    border_color = (200, 200, 200)
-    draw.rectangle([(10, 10), (width - 10, height - 10)], outline=border_color, width=2)
-
     # 文本处理
     lines = text.split("\n")
     left_margin = 40  # 左边距
@@ -1,33 +1,66 @@
 import asyncio
+import hashlib
 import random
-from typing import Dict, List, Literal, Optional, Union
+import time
+from functools import partial
+from typing import Callable, Dict, List, Literal, Optional, Union
+from uuid import uuid4
 
 from gsuid_core.bot import Bot
 from gsuid_core.logger import logger
 from gsuid_core.models import Event
 from gsuid_core.segment import MessageSegment
+from gsuid_core.server import on_core_start
 from gsuid_core.utils.boardcast.models import BoardCastMsg, BoardCastMsgDict
 
 from ..roversign_config.roversign_config import RoverSignConfig
+from ..utils.api.adaptive import adaptive_controller
+from ..utils.api.pacer import Pacer, pacer_sleep
+from ..utils.api.retry import circuit_breakers
 from ..utils.boardcast import send_board_cast_msg
 from ..utils.constant import BoardcastTypeEnum
+from ..utils.credential import credential_cache
 from ..utils.database.models import (
     RoverSign,
+    RoverSignBatToken,
     RoverSignData,
+    RoverSignRun,
+    RoverSignRunItem,
+    RunStep,
     WavesBind,
     WavesUser,
 )
+from ..utils.database.sign_buffer import sign_buffer
 from ..utils.database.states import SignStatus
 from ..utils.errors import WAVES_CODE_101_MSG
 from ..utils.rover_api import rover_api
+from ..utils.util import get_today_date
 from .main import (
-    create_sign_info_image,
+    add_sign_report,
     do_single_task,
     get_sign_interval,
     sign_in,
     single_daily_sign,
     single_task,
 )
+from .post_pool import post_pool
+from .render import render_sign_info_images
+from .worker_pool import SignWorkerPool
+
+# 重启后等待多久再继续中断的自动签到（秒），留出 bot 重连时间
+RESUME_DELAY = 60
+
+# 同一时间只允许一次自动签到
+_auto_sign_lock = asyncio.Lock()
+
+# 手动签到时同时处理的特征码数量
+USER_SIGN_CONCURRENCY = 3
+
+# 每个执行槽位对应的同时进行中账号数
+PACER_ACCOUNT_FACTOR = 4
+
+# 单账号游戏签到与社区任务之间的随机间隔（秒）
+PHASE_GAP = (1, 2)
 
 SIGN_STATUS = {
     True: "✅ 已完成",
@@ -62,7 +95,7 @@ async def action_sign_in(uid: str, token: str):
             signed = True
 
     if signed:
-        await RoverSign.upsert_rover_sign(RoverSignData.build_game_sign(uid))
+        await sign_buffer.put(RoverSignData.build_game_sign(uid))
 
     return signed
 
@@ -90,41 +123,59 @@ async def rover_sign_up_handler(bot: Bot, ev: Event):
     if uid_list is None:
         return WAVES_CODE_101_MSG
 
-    to_msg = {}
-    expire_uid = []
+    to_msg: Dict[str, Dict[str, Union[bool, str]]] = {}
+    pending_uid = []
     for uid in uid_list:
         msg_temp: Dict[str, Union[bool, str]] = {
             "signed": False,
             "bbs_signed": False,
         }
 
-        rover_sign: Optional[RoverSign] = await RoverSign.get_sign_data(uid)
+        rover_sign: Optional[RoverSign] = await sign_buffer.get_sign_data(uid)
         if rover_sign:
             if SignStatus.game_sign_complete(rover_sign):
                 msg_temp["signed"] = "skip"
             if SignStatus.bbs_sign_complete(rover_sign):
                 msg_temp["bbs_signed"] = "skip"
 
-        if msg_temp["signed"] and msg_temp["bbs_signed"]:
-            to_msg[uid] = msg_temp
-            continue
+        to_msg[uid] = msg_temp
+        if not (msg_temp["signed"] and msg_temp["bbs_signed"]):
+            pending_uid.append(uid)
 
-        token = await rover_api.get_self_waves_ck(uid, ev.user_id, ev.bot_id)
-        if not token:
-            expire_uid.append(uid)
-            continue
+    if len(pending_uid) > 1:
+        await bot.send(f"[RoverSign] 正在为 {len(pending_uid)} 个特征码签到，请稍候...")
 
-        # 签到状态
-        if not msg_temp["signed"]:
-            msg_temp["signed"] = await action_sign_in(uid, token)
+    semaphore = asyncio.Semaphore(USER_SIGN_CONCURRENCY)
+    expire_uid = []
 
-        # 社区签到状态
-        if not msg_temp["bbs_signed"]:
-            msg_temp["bbs_signed"] = await action_bbs_sign_in(uid, token)
+    async def sign_uid(uid: str):
+        msg_temp = to_msg[uid]
+        # 每个账号各自一个请求流程，手动签到不计入单账号限速
+        async with semaphore, rover_api.flow():
+            token = await rover_api.get_self_waves_ck(uid, ev.user_id, ev.bot_id)
+            if not token:
+                expire_uid.append(uid)
+                del to_msg[uid]
+                return
 
-        to_msg[uid] = msg_temp
+            # 签到状态
+            if not msg_temp["signed"]:
+                msg_temp["signed"] = await action_sign_in(uid, token)
 
-        await asyncio.sleep(random.randint(1, 2))
+            # 社区签到状态
+            if not msg_temp["bbs_signed"]:
+                msg_temp["bbs_signed"] = await action_bbs_sign_in(uid, token)
+
+            # 同一并发位上的特征码之间保留随机间隔
+            await asyncio.sleep(random.uniform(1, 2))
+
+    results = await asyncio.gather(
+        *(sign_uid(uid) for uid in pending_uid), return_exceptions=True
+    )
+    for uid, result in zip(pending_uid, results):
+        if isinstance(result, Exception):
+            logger.exception(f"[鸣潮] [签到] UID{uid} 签到异常", result)
+    expire_uid.sort(key=uid_list.index)
 
     if not to_msg:
         return WAVES_CODE_101_MSG
@@ -146,30 +197,100 @@ async def rover_sign_up_handler(bot: Bot, ev: Event):
     return "\n".join(msg_list)
 
 
+async def push_private_report(
+    private_msgs: Dict,
+    type: Literal["社区签到", "游戏签到"],
+    idem_prefix: str,
+):
+    """单个账号完成后立即把私聊报告写入推送队列"""
+    if not private_msgs or not RoverSignConfig.get_config("PrivateSignReport").data:
+        return
+    result = await to_board_cast_msg(private_msgs, {}, type)
+    await send_board_cast_msg(result, BoardcastTypeEnum.SIGN_WAVES, idem_prefix)
+
+
+def get_window_offset(uid: str, window_minutes: int) -> int:
+    """按 uid 哈希得到窗口内固定的分钟偏移，同一账号每天落在同一时刻"""
+    return int(hashlib.md5(uid.encode()).hexdigest(), 16) % window_minutes
+
+
+def get_window_ready_at(
+    window_start: int, window_minutes: int, user: WavesUser
+) -> float:
+    """账号在窗口内的开始执行时间戳"""
+    return window_start + get_window_offset(user.uid, window_minutes) * 60
+
+
+async def get_adaptive_sign_interval() -> float:
+    return await get_sign_interval() * adaptive_controller.interval_scale
+
+
+async def rover_bat_prefresh_task():
+    """签到前刷新过旧的 bat 令牌"""
+    refreshed_map = await RoverSignBatToken.get_refreshed_map()
+    users = [
+        user
+        for user in await WavesUser.get_waves_unsigned_user()
+        if user.cookie
+        and not user.status
+        and rover_api.bat_manager.is_stale(user, refreshed_map.get(user.uid))
+    ]
+    if not users:
+        return
+
+    refreshed = 0
+
+    async def refresh_user(user: WavesUser):
+        nonlocal refreshed
+        if await rover_api.bat_manager.refresh(user.uid, user.cookie, user.did):
+            refreshed += 1
+
+    max_concurrent: int = RoverSignConfig.get_config("SigninConcurrentNum").data
+    await SignWorkerPool(
+        max_concurrent, refresh_user, get_sign_interval, name="bat令牌刷新"
+    ).run(users)
+    logger.info(f"[RoverSign] [bat令牌刷新] 已刷新 {refreshed}/{len(users)} 个账号")
+
+
 async def rover_auto_sign_task():
+    if _auto_sign_lock.locked():
+        return "[鸣潮]自动任务正在执行中，请稍后再试"
+    async with _auto_sign_lock:
+        return await _rover_auto_sign_task()
+
+
+async def _rover_auto_sign_task():
+    today = get_today_date()
+    # 当天有未完成的执行时从检查点继续，沿用原执行ID，推送队列按幂等键去重
+    run = await RoverSignRun.get_unfinished_run(today)
+    run_id = run.run_id if run else f"{today}-{uuid4().hex[:8]}"
+    items = await RoverSignRunItem.get_items(run_id) if run else {}
+    if run:
+        logger.info(
+            f"[鸣潮] [自动签到] 从检查点继续执行 {run_id} 已有进度 {len(items)} 个账号"
+        )
 
     need_user_list: List[WavesUser] = []
+    sign_data_map: Dict[str, RoverSign] = {}
     bbs_user = set()
     sign_user = set()
     if (
         RoverSignConfig.get_config("BBSSchedSignin").data
         or RoverSignConfig.get_config("SchedSignin").data
     ):
-        _user_list: List[WavesUser] = await WavesUser.get_waves_all_user()
+        # 先落库尚未写入的签到状态，再由 SQL 侧过滤掉今日已全部完成的账号
+        await sign_buffer.flush()
+        _user_list: List[WavesUser] = await WavesUser.get_waves_unsigned_user()
+        sign_data_map = await RoverSign.get_sign_data_map()
+        credential_cache.prime(_user_list)
         for user in _user_list:
             _uid = user.user_id
-            if not _uid:
+            if not _uid or not user.cookie or user.status:
                 continue
 
-            is_signed_game = False
-            is_signed_bbs = False
-            rover_sign: Optional[RoverSign] = await RoverSign.get_sign_data(user.uid)
-            if rover_sign and SignStatus.game_sign_complete(rover_sign):
-                is_signed_game = True
-            if rover_sign and SignStatus.bbs_sign_complete(rover_sign):
-                is_signed_bbs = True
-
-            if is_signed_game and is_signed_bbs:
+            item = items.get(user.uid)
+            if item and item.step >= RunStep.REPORTED:
+                # 上次执行已完成的账号
                 continue
 
             if RoverSignConfig.get_config("SigninMaster").data:
@@ -193,110 +314,228 @@ async def rover_auto_sign_task():
             if is_need:
                 need_user_list.append(user)
 
-    private_sign_msgs = {}
+    if not need_user_list and not run:
+        return "暂无需要签到的账号"
+    if not run:
+        await RoverSignRun.create_run(run_id, today)
+
+    async def checkpoint(uid: str, step: int, report: Dict, error: str = ""):
+        await RoverSignRunItem.save_step(run_id, today, uid, step, report, error)
+
+    async def process_user(user: WavesUser):
+        item = items.get(user.uid)
+        report = item.load_report() if item else {}
+        report.update({"bot_id": user.bot_id, "qid": user.user_id})
+        try:
+            async with rover_api.flow(user.uid, user.cookie, paced=True):
+                await process_user_flow(user, item.step if item else 0, report)
+        except Exception as e:
+            # 单个账号失败不影响整批，下次继续时重试
+            await checkpoint(user.uid, RunStep.FAILED, report, repr(e))
+            raise
+
+    async def process_user_flow(user: WavesUser, step: int, report: Dict):
+        if user.cookie == "" or user.status:
+            # 执行期间失效的账号同样记为完成，补跑时不再重复处理
+            await checkpoint(user.uid, RunStep.REPORTED, report, "账号已失效")
+            return
+
+        need_sign = step < RunStep.GAME_SIGN and (
+            (RoverSignConfig.get_config("SchedSignin").data and user.uid in sign_user)
+            or RoverSignConfig.get_config("SigninMaster").data
+        )
+        need_bbs = step < RunStep.BBS_TASK and (
+            (RoverSignConfig.get_config("BBSSchedSignin").data and user.uid in bbs_user)
+            or RoverSignConfig.get_config("SigninMaster").data
+        )
+        if not (need_sign or need_bbs):
+            await checkpoint(user.uid, RunStep.REPORTED, report)
+            return
+
+        check_res = await rover_api.check_token(user)
+        if not check_res.success and check_res.is_bat_token_invalid:
+            # bat 刷新成功后继续签到，不再跳过当晚
+            if await rover_api.bat_manager.refresh(user.uid, user.cookie, user.did):
+                check_res = await rover_api.check_token(user)
+        if not check_res.success:
+            await check_res.mark_cookie_invalid(user.uid, user.cookie)
+            # 登录失效的账号记为完成，补跑时不再重复校验；其他失败留给补跑重试
+            done = RunStep.REPORTED if check_res.is_token_invalid else RunStep.FAILED
+            await checkpoint(user.uid, done, report, check_res.msg)
+            return
+
+        # 每个阶段只在完成后写一次检查点，最后一个阶段直接记为已完成
+        if need_sign:
+            private_sign_msgs = {}
+            im = await single_daily_sign(
+                user.bot_id,
+                user.uid,
+                user.sign_switch,
+                user.user_id,
+                user.cookie,
+                private_sign_msgs,
+                {},
+                {"failed": 0, "success": 0},
+            )
+            await push_private_report(
+                private_sign_msgs, "游戏签到", f"{run_id}:sign:{user.uid}"
+            )
+            report.update({"sign_gid": user.sign_switch, "sign_msg": im})
+            if not need_bbs:
+                await checkpoint(user.uid, RunStep.REPORTED, report)
+                return
+            await checkpoint(user.uid, RunStep.GAME_SIGN, report)
+            # 游戏签到与社区任务之间保留随机间隔，等待时交出执行槽位
+            await pacer_sleep(random.uniform(*PHASE_GAP))
+
+        if need_bbs:
+            private_bbs_msgs = {}
+            im = await single_task(
+                user.bot_id,
+                user.uid,
+                user.bbs_sign_switch,
+                user.user_id,
+                user.cookie,
+                private_bbs_msgs,
+                {},
+                {"failed": 0, "success": 0},
+                sign_data_map.get(user.uid) or RoverSignData.build_bbs_sign(user.uid),
+            )
+            await push_private_report(
+                private_bbs_msgs, "社区签到", f"{run_id}:bbs:{user.uid}"
+            )
+            report.update({"bbs_gid": user.bbs_sign_switch, "bbs_msg": im or ""})
+
+        await checkpoint(user.uid, RunStep.REPORTED, report)
+
+    max_concurrent: int = RoverSignConfig.get_config("SigninConcurrentNum").data
+    adaptive_controller.reset(max_concurrent)
+    circuit_breakers.reset_stats()
+    post_pool.expire()
+    if adaptive_controller.enable:
+        max_slots = adaptive_controller.max_num
+        interval_func = get_adaptive_sign_interval
+        pacer = Pacer(lambda: adaptive_controller.concurrency)
+    else:
+        max_slots = max_concurrent
+        interval_func = get_sign_interval
+        pacer = Pacer(lambda: max_concurrent)
+
+    ready_at: Optional[Callable[[WavesUser], float]] = None
+    window_minutes: int = RoverSignConfig.get_config("SignWindowMinutes").data
+    if RoverSignConfig.get_config("SignWindow").data and window_minutes > 0:
+        # 窗口模式：每个账号按 uid 哈希落在窗口内固定的某一分钟，继续执行时沿用原窗口
+        window_start = run.created_at if run else int(time.time())
+        ready_at = partial(get_window_ready_at, window_start, window_minutes)
+
+        logger.info(
+            f"[鸣潮] [自动签到] 窗口模式 {len(need_user_list)} 个账号"
+            f"分布在 {window_minutes} 分钟内执行"
+        )
+
+    # 账号等待节奏时交出槽位，同时进行中的账号数是槽位数的若干倍
+    worker_pool = SignWorkerPool(
+        max_slots * PACER_ACCOUNT_FACTOR,
+        process_user,
+        interval_func,
+        pacer=pacer,
+        ready_at=ready_at,
+    )
+    await worker_pool.run(need_user_list)
+    await sign_buffer.flush()
+
+    if ready_at:
+        # 窗口结束后补跑未完成的账号
+        items = await RoverSignRunItem.get_items(run_id)
+        catch_up_list = [
+            user
+            for user in need_user_list
+            if user.uid not in items or items[user.uid].step < RunStep.REPORTED
+        ]
+        if catch_up_list:
+            logger.info(f"[鸣潮] [自动签到] 补跑未完成的 {len(catch_up_list)} 个账号")
+            catch_up_pool = SignWorkerPool(
+                max_slots * PACER_ACCOUNT_FACTOR,
+                process_user,
+                interval_func,
+                name="自动签到补跑",
+                pacer=pacer,
+            )
+            await catch_up_pool.run(catch_up_list)
+            await sign_buffer.flush()
+            worker_pool.failed += catch_up_pool.failed
+
+    # 报告从检查点汇总，包含此前中断的执行里已完成的账号
     group_sign_msgs = {}
     all_sign_msgs = {"failed": 0, "success": 0}
-
-    private_bbs_msgs = {}
     group_bbs_msgs = {}
     all_bbs_msgs = {"failed": 0, "success": 0}
+    for uid, item in (await RoverSignRunItem.get_items(run_id)).items():
+        report = item.load_report()
+        if report.get("sign_msg"):
+            add_sign_report(
+                report["bot_id"],
+                uid,
+                report["sign_gid"],
+                report["qid"],
+                report["sign_msg"],
+                {},
+                group_sign_msgs,
+                all_sign_msgs,
+            )
+        if report.get("bbs_msg"):
+            add_sign_report(
+                report["bot_id"],
+                uid,
+                report["bbs_gid"],
+                report["qid"],
+                report["bbs_msg"],
+                {},
+                group_bbs_msgs,
+                all_bbs_msgs,
+            )
+
+    # 私聊报告已在每个账号完成时写入推送队列，这里只汇总群报告
+    if RoverSignConfig.get_config("GroupSignReport").data:
+        sign_result = await to_board_cast_msg(
+            {}, group_sign_msgs, "游戏签到", theme="blue"
+        )
+        await send_board_cast_msg(
+            sign_result, BoardcastTypeEnum.SIGN_WAVES, f"{run_id}:sign"
+        )
 
-    async def process_user(semaphore, user: WavesUser):
-        async with semaphore:
-            if user.cookie == "":
-                return
-            if user.status:
-                return
-
-            login_res = await rover_api.login_log(user.uid, user.cookie)
-            if not login_res.success:
-                if login_res.is_bat_token_invalid:
-                    if waves_user := await rover_api.refresh_bat_token(user):
-                        user.cookie = waves_user.cookie
-                else:
-                    await login_res.mark_cookie_invalid(user.uid, user.cookie)
-                return
+        bbs_result = await to_board_cast_msg(
+            {}, group_bbs_msgs, "社区签到", theme="yellow"
+        )
+        await send_board_cast_msg(
+            bbs_result, BoardcastTypeEnum.SIGN_WAVES, f"{run_id}:bbs"
+        )
+    await RoverSignRun.finish_run(run_id)
+
+    msg_list = [
+        "[鸣潮]自动任务",
+        f"今日成功游戏签到 {all_sign_msgs['success']} 个账号",
+        f"今日社区签到 {all_bbs_msgs['success']} 个账号",
+    ]
+    if worker_pool.failed:
+        msg_list.append(f"执行异常 {worker_pool.failed} 个账号")
+    if breaker_summary := circuit_breakers.summary():
+        msg_list.append("接口熔断情况:")
+        msg_list.extend(breaker_summary)
+    return "\n".join(msg_list)
 
-            refresh_res = await rover_api.refresh_data(user.uid, user.cookie)
-            if not refresh_res.success:
-                if refresh_res.is_bat_token_invalid:
-                    if waves_user := await rover_api.refresh_bat_token(user):
-                        user.cookie = waves_user.cookie
-                else:
-                    await refresh_res.mark_cookie_invalid(user.uid, user.cookie)
-                return
 
-            await asyncio.sleep(random.randint(1, 2))
-
-            if (
-                RoverSignConfig.get_config("SchedSignin").data and user.uid in sign_user
-            ) or RoverSignConfig.get_config("SigninMaster").data:
-                await single_daily_sign(
-                    user.bot_id,
-                    user.uid,
-                    user.sign_switch,
-                    user.user_id,
-                    user.cookie,
-                    private_sign_msgs,
-                    group_sign_msgs,
-                    all_sign_msgs,
-                )
-
-                await asyncio.sleep(random.randint(1, 2))
-
-            if (
-                RoverSignConfig.get_config("BBSSchedSignin").data
-                and user.uid in bbs_user
-            ) or RoverSignConfig.get_config("SigninMaster").data:
-                await single_task(
-                    user.bot_id,
-                    user.uid,
-                    user.bbs_sign_switch,
-                    user.user_id,
-                    user.cookie,
-                    private_bbs_msgs,
-                    group_bbs_msgs,
-                    all_bbs_msgs,
-                )
-
-                await asyncio.sleep(random.randint(2, 4))
-
-    if not need_user_list:
-        return "暂无需要签到的账号"
+@on_core_start
+async def resume_auto_sign_run():
+    """重启后继续当天中断的自动签到"""
 
-    max_concurrent: int = RoverSignConfig.get_config("SigninConcurrentNum").data
-    semaphore = asyncio.Semaphore(max_concurrent)
-    tasks = [process_user(semaphore, user) for user in need_user_list]
-    for i in range(0, len(tasks), max_concurrent):
-        batch = tasks[i : i + max_concurrent]
-        results = await asyncio.gather(*batch, return_exceptions=True)
-        for result in results:
-            if isinstance(result, Exception):
-                return f"{result.args[0]}"
-
-        delay = round(await get_sign_interval(), 2)
-        logger.info(f"[鸣潮] [自动签到] 等待{delay:.2f}秒进行下一次签到")
-        await asyncio.sleep(delay)
-
-    sign_result = await to_board_cast_msg(
-        private_sign_msgs, group_sign_msgs, "游戏签到", theme="blue"
-    )
-    if not RoverSignConfig.get_config("PrivateSignReport").data:
-        sign_result["private_msg_dict"] = {}
-    if not RoverSignConfig.get_config("GroupSignReport").data:
-        sign_result["group_msg_dict"] = {}
-    await send_board_cast_msg(sign_result, BoardcastTypeEnum.SIGN_WAVES)
-
-    bbs_result = await to_board_cast_msg(
-        private_bbs_msgs, group_bbs_msgs, "社区签到", theme="yellow"
-    )
-    if not RoverSignConfig.get_config("PrivateSignReport").data:
-        bbs_result["private_msg_dict"] = {}
-    if not RoverSignConfig.get_config("GroupSignReport").data:
-        bbs_result["group_msg_dict"] = {}
-    await send_board_cast_msg(bbs_result, BoardcastTypeEnum.SIGN_WAVES)
+    async def resume():
+        await asyncio.sleep(RESUME_DELAY)
+        if await RoverSignRun.get_unfinished_run(get_today_date()):
+            logger.info("[鸣潮] [自动签到] 检测到未完成的自动签到，继续执行")
+            await rover_auto_sign_task()
 
-    return f"[鸣潮]自动任务\n今日成功游戏签到 {all_sign_msgs['success']} 个账号\n今日社区签到 {all_bbs_msgs['success']} 个账号"
+    asyncio.create_task(resume())
 
 
 async def to_board_cast_msg(
@@ -325,16 +564,28 @@ async def to_board_cast_msg(
 
     failed_num = 0
     success_num = 0
+    titles: Dict[str, str] = {}
     for gid in group_msgs:
         success = group_msgs[gid]["success"]
         faild = group_msgs[gid]["failed"]
         success_num += int(success)
         failed_num += int(faild)
-        title = f"✅[鸣潮]今日{type}任务已完成！\n本群共签到成功{success}人\n共签到失败{faild}人"
+        titles[gid] = (
+            f"✅[鸣潮]今日{type}任务已完成！\n本群共签到成功{success}人\n共签到失败{faild}人"
+        )
+
+    # 所有群的图片报告在线程池中并行渲染
+    images: Dict[str, bytes] = {}
+    if titles and RoverSignConfig.get_config("GroupSignReportPic").data:
+        rendered = await render_sign_info_images(
+            (title, "yellow") for title in titles.values()
+        )
+        images = dict(zip(titles.keys(), rendered))
+
+    for gid, title in titles.items():
         messages = []
-        if RoverSignConfig.get_config("GroupSignReportPic").data:
-            image = create_sign_info_image(title, theme="yellow")
-            messages.append(MessageSegment.image(image))
+        if gid in images:
+            messages.append(MessageSegment.image(images[gid]))
         else:
             messages.append(MessageSegment.text(title))
         if group_msgs[gid]["push_message"]:
@@ -0,0 +1,95 @@
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional
+
+from gsuid_core.logger import logger
+
+from ..roversign_config.roversign_config import RoverSignConfig
+from ..utils.rover_api import rover_api
+
+# 帖子池过期时间（秒），过期后由下一个需要帖子的账号刷新
+POST_POOL_TTL = 3600
+
+
+class PostPool:
+    """
+    浏览/点赞共用的帖子池
+    从多个版块、多页拉取并按 postId 去重；各账号依次取不重叠的帖子，
+    取完一轮后重新打乱，失败或已删除的帖子移出池子
+    """
+
+    def __init__(self):
+        self._posts: List[Dict] = []
+        self._cursor = 0
+        self._expire_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._posts)
+
+    def expire(self):
+        """每次自动签到开始时调用，保证每次执行只刷新一次"""
+        self._expire_at = 0
+
+    async def ensure(self, token: str) -> bool:
+        if self._posts and self._expire_at > time.monotonic():
+            return True
+        async with self._lock:
+            if self._posts and self._expire_at > time.monotonic():
+                return True
+            await self._refresh(token)
+        return bool(self._posts)
+
+    async def _refresh(self, token: str):
+        forums: List[str] = RoverSignConfig.get_config("BBSPostForums").data or ["9"]
+        pages: int = max(1, RoverSignConfig.get_config("BBSPostPages").data)
+
+        posts: Dict[str, Dict] = {}
+        for forum_id in forums:
+            for page in range(1, pages + 1):
+                res = await rover_api.get_form_list(token, forum_id, page)
+                if not res or not res.success or not isinstance(res.data, dict):
+                    break
+                page_posts = res.data.get("postList") or []
+                for post in page_posts:
+                    if post.get("postId") and post.get("userId"):
+                        posts.setdefault(str(post["postId"]), post)
+                if len(page_posts) < 20:
+                    break
+
+        if not posts:
+            logger.warning("[鸣潮][社区签到] 帖子池刷新失败")
+            return
+
+        self._posts = list(posts.values())
+        random.shuffle(self._posts)
+        self._cursor = 0
+        self._expire_at = time.monotonic() + POST_POOL_TTL
+        logger.info(
+            f"[鸣潮][社区签到] 帖子池已刷新 版块: {forums} 帖子数: {len(self._posts)}"
+        )
+
+    def draw(self) -> Optional[Dict]:
+        """取下一个帖子，一轮取完后重新打乱"""
+        if not self._posts:
+            return None
+        if self._cursor >= len(self._posts):
+            random.shuffle(self._posts)
+            self._cursor = 0
+        post = self._posts[self._cursor]
+        self._cursor += 1
+        return post
+
+    def discard(self, post: Dict):
+        """移除失败或已删除的帖子"""
+        try:
+            index = self._posts.index(post)
+        except ValueError:
+            return
+        self._posts.pop(index)
+        if index < self._cursor:
+            self._cursor -= 1
+
+
+post_pool = PostPool()
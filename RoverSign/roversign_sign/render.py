@@ -0,0 +1,47 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Iterable, List, Literal, Tuple
+
+from gsuid_core.server import on_core_shutdown
+
+from .main import create_sign_info_image
+
+# PIL 绘制与编码在线程池中执行，不阻塞事件循环；线程数即最大并发
+RENDER_WORKERS = 2
+
+_executor = ThreadPoolExecutor(
+    max_workers=RENDER_WORKERS, thread_name_prefix="RoverSignRender"
+)
+
+
+def _render_sign_info(text: str, theme: str, fmt: str) -> bytes:
+    img = create_sign_info_image(text, theme=theme)
+    buffer = BytesIO()
+    if fmt == "JPEG":
+        img.convert("RGB").save(buffer, format=fmt, quality=90)
+    else:
+        img.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+async def render_sign_info_image(
+    text: str, theme: str = "blue", fmt: Literal["PNG", "JPEG"] = "PNG"
+) -> bytes:
+    """渲染签到报告图片，返回可直接用于 MessageSegment.image 的字节"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _render_sign_info, text, theme, fmt)
+
+
+async def render_sign_info_images(
+    items: Iterable[Tuple[str, str]], fmt: Literal["PNG", "JPEG"] = "PNG"
+) -> List[bytes]:
+    """并行渲染多张报告图片，items 为 (text, theme)"""
+    return await asyncio.gather(
+        *(render_sign_info_image(text, theme, fmt) for text, theme in items)
+    )
+
+
+@on_core_shutdown
+async def shutdown_render_executor():
+    _executor.shutdown(wait=False)
@@ -0,0 +1,54 @@
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+from gsuid_core.logger import logger
+
+from ..utils.api.pacer import pacer_gather, pacer_sleep
+
+TaskNode = Tuple[Callable[[], Awaitable[Any]], Tuple[str, ...]]
+
+
+class TaskGraph:
+    """
+    单账号内的任务 DAG
+    依赖全部成功后节点即可执行，同时执行的节点数不超过 concurrency；
+    依赖失败的节点直接记为失败；gap 为节点开始前的随机间隔（秒）
+    """
+
+    def __init__(self, concurrency: int = 1, gap: Tuple[float, float] = (0, 0)):
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._gap = gap
+        self._nodes: Dict[str, TaskNode] = {}
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        deps: Iterable[str] = (),
+    ):
+        self._nodes[name] = (func, tuple(deps))
+
+    async def run(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        futures = {name: loop.create_future() for name in self._nodes}
+
+        async def run_node(name: str):
+            func, deps = self._nodes[name]
+            result: Any = False
+            try:
+                if all([await futures[dep] for dep in deps if dep in futures]):
+                    async with self._sem:
+                        await pacer_sleep(random.uniform(*self._gap))
+                        result = await func()
+            except Exception as e:
+                logger.exception(f"[鸣潮][社区签到] 任务 {name} 异常", e)
+            finally:
+                # 被取消时也要结束，否则依赖它的节点会一直等待
+                if not futures[name].done():
+                    futures[name].set_result(result)
+            return result
+
+        names = list(self._nodes)
+        results = await pacer_gather(*(run_node(name) for name in names))
+        return dict(zip(names, results))
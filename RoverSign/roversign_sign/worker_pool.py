@@ -0,0 +1,121 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Generic, Iterable, Optional, TypeVar
+
+from gsuid_core.logger import logger
+
+from ..utils.api.pacer import Pacer
+
+T = TypeVar("T")
+
+
+class SignWorkerPool(Generic[T]):
+    """
+    固定数量的 worker 持续从队列中取任务执行
+    每个 worker 完成一个任务后按 interval_func 单独等待，不再按批次互相等待
+    传入 pacer 时任务只在执行时占用 pacer 槽位，worker 数即同时进行中的账号数
+    传入 ready_at 时任务按其返回的时间戳排序，到点后才开始执行
+    """
+
+    def __init__(
+        self,
+        worker_num: int,
+        handler: Callable[[T], Awaitable[None]],
+        interval_func: Optional[Callable[[], Awaitable[float]]] = None,
+        name: str = "自动签到",
+        report_interval: float = 30,
+        pacer: Optional[Pacer] = None,
+        ready_at: Optional[Callable[[T], float]] = None,
+    ):
+        self.worker_num = max(1, worker_num)
+        self.handler = handler
+        self.interval_func = interval_func
+        self.name = name
+        self.report_interval = report_interval
+        self.pacer = pacer
+        self.ready_at = ready_at
+
+        self._queue: "asyncio.Queue[T]" = asyncio.Queue()
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.in_flight = 0
+        self._start_time = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def eta(self) -> float:
+        if not self.done:
+            return 0
+        elapsed = time.monotonic() - self._start_time
+        remaining = self.total - self.done
+        return elapsed / self.done * remaining
+
+    def progress(self) -> str:
+        eta = int(self.eta())
+        msg = (
+            f"进度: {self.done}/{self.total} 队列: {self.queue_depth} "
+            f"执行中: {self.in_flight} 失败: {self.failed} "
+            f"预计剩余: {eta // 60}分{eta % 60}秒"
+        )
+        if self.pacer:
+            msg += f" 占用槽位: {self.pacer.active}"
+        return msg
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            if self.ready_at:
+                wait = self.ready_at(item) - time.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            self.in_flight += 1
+            try:
+                if self.pacer:
+                    async with self.pacer.slot():
+                        await self.handler(item)
+                else:
+                    await self.handler(item)
+            except Exception as e:
+                self.failed += 1
+                logger.exception(f"[鸣潮] [{self.name}] worker{index} 任务异常", e)
+            finally:
+                self.in_flight -= 1
+                self.done += 1
+                self._queue.task_done()
+
+            if self.interval_func and not self._queue.empty():
+                delay = round(await self.interval_func(), 2)
+                logger.debug(
+                    f"[鸣潮] [{self.name}] worker{index} 等待{delay:.2f}秒进行下一次签到"
+                )
+                await asyncio.sleep(delay)
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logger.info(f"[鸣潮] [{self.name}] {self.progress()}")
+
+    async def run(self, items: Iterable[T]):
+        if self.ready_at:
+            items = sorted(items, key=self.ready_at)
+        for item in items:
+            self._queue.put_nowait(item)
+            self.total += 1
+
+        self._start_time = time.monotonic()
+        reporter = asyncio.create_task(self._report())
+        try:
+            await asyncio.gather(
+                *(self._worker(i) for i in range(min(self.worker_num, self.total)))
+            )
+        finally:
+            reporter.cancel()
+        logger.info(f"[鸣潮] [{self.name}] 执行完成 {self.progress()}")
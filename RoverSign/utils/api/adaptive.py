@@ -0,0 +1,110 @@
+from typing import List, Optional
+
+from gsuid_core.logger import logger
+
+from .request_util import RespCode, ThrowMsg
+
+# 每累计多少次请求评估一次
+ADAPTIVE_WINDOW = 20
+# 窗口内 繁忙/风控/网络错误 比例超过该值即减速
+ADAPTIVE_ERROR_RATE = 0.05
+# 窗口内延迟中位数超过基线的倍数即减速
+ADAPTIVE_LATENCY_RATIO = 2.0
+# 请求间隔的缩放范围
+ADAPTIVE_MIN_SCALE = 0.5
+ADAPTIVE_MAX_SCALE = 4.0
+
+
+def get_adaptive_config():
+    from ...roversign_config.roversign_config import RoverSignConfig
+
+    enable: bool = RoverSignConfig.get_config("SigninAdaptive").data
+    min_num: int = RoverSignConfig.get_config("SigninConcurrentMin").data
+    max_num: int = RoverSignConfig.get_config("SigninConcurrentMax").data
+    return enable, max(1, min_num), max(1, min_num, max_num)
+
+
+class AdaptiveController:
+    """
+    AIMD 并发控制
+    _waves_request 上报每次请求的延迟与结果；窗口内一切正常时并发 +1、间隔缩短，
+    出现繁忙/风控/网络错误或延迟明显升高时并发减半、间隔加倍
+    """
+
+    def __init__(self):
+        self.enable = False
+        self.min_num = 1
+        self.max_num = 1
+        self.limit = 1.0
+        self.interval_scale = 1.0
+        self._baseline: Optional[float] = None
+        self._latencies: List[float] = []
+        self._errors = 0
+
+    @property
+    def concurrency(self) -> int:
+        return int(self.limit)
+
+    def reset(self, initial: int):
+        """每次自动签到开始时按配置重置"""
+        self.enable, self.min_num, self.max_num = get_adaptive_config()
+        self.limit = float(min(max(initial, self.min_num), self.max_num))
+        self.interval_scale = 1.0
+        self._baseline = None
+        self._latencies = []
+        self._errors = 0
+
+    def record(
+        self,
+        latency: float,
+        code: Optional[int] = None,
+        msg: str = "",
+        error: bool = False,
+    ):
+        if not self.enable:
+            return
+        if (
+            error
+            or code == RespCode.DANGER_ENV.value
+            or code == RespCode.SERVER_ERROR.value
+            or msg == ThrowMsg.SYSTEM_BUSY
+        ):
+            self._errors += 1
+        self._latencies.append(latency)
+        if len(self._latencies) >= ADAPTIVE_WINDOW:
+            self._evaluate()
+
+    def _evaluate(self):
+        latencies = sorted(self._latencies)
+        median = latencies[len(latencies) // 2]
+        error_rate = self._errors / len(latencies)
+        self._latencies = []
+        self._errors = 0
+
+        # 以本次执行中最好的窗口延迟为基线
+        if self._baseline is None or median < self._baseline:
+            self._baseline = median
+
+        old_limit, old_scale = self.concurrency, self.interval_scale
+        if (
+            error_rate > ADAPTIVE_ERROR_RATE
+            or median > self._baseline * ADAPTIVE_LATENCY_RATIO
+        ):
+            self.limit = max(float(self.min_num), self.limit / 2)
+            self.interval_scale = min(ADAPTIVE_MAX_SCALE, self.interval_scale * 2)
+            reason = f"错误率{error_rate:.0%} 延迟{median:.2f}s"
+        else:
+            self.limit = min(float(self.max_num), self.limit + 1)
+            self.interval_scale = max(
+                ADAPTIVE_MIN_SCALE, round(self.interval_scale - 0.1, 1)
+            )
+            reason = "请求正常"
+
+        if old_limit != self.concurrency or old_scale != self.interval_scale:
+            logger.info(
+                f"[鸣潮] [自动签到] 并发调整 {old_limit} -> {self.concurrency} "
+                f"间隔倍率 {old_scale:.1f} -> {self.interval_scale:.1f} ({reason})"
+            )
+
+
+adaptive_controller = AdaptiveController()
@@ -0,0 +1,124 @@
+import inspect
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional, Tuple
+
+from ..cache import AsyncTTLCache, _make_key
+
+# 单次签到流程内，幂等读接口的结果最多复用的时间（秒）
+FLOW_TTL = 300
+
+
+class RequestFlow:
+    """
+    一次签到流程的上下文：所属账号与流程内缓存
+    paced 为 True 时流程内的请求计入单账号限速，只用于自动签到
+    """
+
+    def __init__(self, uid: str = "", cookie: str = "", paced: bool = False):
+        self.uid = uid
+        self.cookie = cookie
+        self.paced = paced
+        self.cache = AsyncTTLCache(FLOW_TTL, maxsize=64)
+
+
+_current_flow: ContextVar[Optional[RequestFlow]] = ContextVar(
+    "rover_request_flow", default=None
+)
+
+# 不在流程内时只合并在途的相同请求，不缓存结果
+_inflight = AsyncTTLCache(0)
+
+
+def _is_success(resp) -> bool:
+    return resp is not None and resp.success
+
+
+@asynccontextmanager
+async def request_flow(uid: str = "", cookie: str = "", paced: bool = False):
+    """
+    一个账号的一次签到流程
+    流程内相同参数的幂等读请求只发一次，嵌套时沿用外层流程
+    """
+    if _current_flow.get() is not None:
+        bind_flow_account(uid, cookie)
+        yield
+        return
+
+    token = _current_flow.set(RequestFlow(uid, cookie, paced))
+    try:
+        yield
+    finally:
+        _current_flow.reset(token)
+
+
+def bind_flow_account(uid: str, cookie: str):
+    """流程开始时还不知道 cookie 的，取到后再绑定"""
+    flow = _current_flow.get()
+    if flow is not None and uid and cookie:
+        flow.uid, flow.cookie = uid, cookie
+
+
+def get_flow_account() -> Optional[Tuple[str, str]]:
+    flow = _current_flow.get()
+    if flow is None or not flow.uid or not flow.cookie:
+        return None
+    return flow.uid, flow.cookie
+
+
+def get_paced_account() -> Optional[str]:
+    """需要按单账号限速的 uid，手动签到等交互流程不限速"""
+    flow = _current_flow.get()
+    if flow is None or not flow.paced or not flow.uid:
+        return None
+    return flow.uid
+
+
+def invalidate_flow():
+    """写操作会改变读接口的结果，清空当前流程内已缓存的结果"""
+    flow = _current_flow.get()
+    if flow is not None:
+        flow.cache.clear()
+
+
+def flow_cached(func):
+    """
+    幂等读接口：流程内复用成功结果，并发的相同请求共享同一次请求
+    失败结果不复用，便于刷新 bat 后重试
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (func.__name__,) + tuple(
+            (name, _make_key(value))
+            for name, value in bound.arguments.items()
+            if name != "self"
+        )
+
+        flow = _current_flow.get()
+        if flow is None:
+            return await _inflight.get_or_load(
+                key, lambda: func(*args, **kwargs), lambda x: False
+            )
+        return await flow.cache.get_or_load(
+            key, lambda: func(*args, **kwargs), _is_success
+        )
+
+    return wrapper
+
+
+def flow_write(func):
+    """写接口：调用后清空流程内缓存"""
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            invalidate_flow()
+
+    return wrapper
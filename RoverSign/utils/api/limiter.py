@@ -0,0 +1,125 @@
+import math
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from gsuid_core.logger import logger
+
+from .pacer import pacer_sleep
+
+
+def get_rate_limit_config():
+    from ...roversign_config.roversign_config import RoverSignConfig
+
+    endpoint_limits: List[str] = RoverSignConfig.get_config("RateLimitEndpoint").data
+    egress_limit: int = RoverSignConfig.get_config("RateLimitPerEgress").data
+    account_limit: int = RoverSignConfig.get_config("RateLimitPerAccount").data
+    account_burst: int = RoverSignConfig.get_config("RateLimitAccountBurst").data
+    return tuple(endpoint_limits), egress_limit, account_limit, account_burst
+
+
+class TokenBucket:
+    """
+    预约式令牌桶，rate 为每秒令牌数
+    令牌可以透支，调用方按返回的等待时间排队，先到先得
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.burst), self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0
+        return -self._tokens / self.rate
+
+
+def _per_minute_bucket(limit: int, burst: int = 0) -> TokenBucket:
+    rate = limit / 60
+    return TokenBucket(rate, max(1, burst, math.ceil(rate)))
+
+
+class RateLimiter:
+    """
+    全局限速：按接口名、出口代理、账号各一组令牌桶
+    一次请求需要同时拿到所有适用桶的令牌
+    """
+
+    def __init__(self):
+        self._source: Optional[Tuple[Tuple[str, ...], int, int, int]] = None
+        self._endpoint_limits: Dict[str, int] = {}
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def _compile(self):
+        source = get_rate_limit_config()
+        if source == self._source:
+            return
+
+        endpoint_limits = {}
+        for item in source[0]:
+            name, _, limit = item.partition(":")
+            try:
+                endpoint_limits[name.strip()] = int(limit)
+            except ValueError:
+                logger.warning(f"[RoverSign] 接口限速配置格式错误: {item}")
+        self._endpoint_limits = endpoint_limits
+        self._buckets = {}
+        self._source = source
+
+    def _get_bucket(
+        self, kind: str, key: str, limit: int, burst: int = 0
+    ) -> Optional[TokenBucket]:
+        if limit <= 0:
+            return None
+        bucket = self._buckets.get((kind, key))
+        if bucket is None:
+            bucket = _per_minute_bucket(limit, burst)
+            self._buckets[(kind, key)] = bucket
+        return bucket
+
+    def reserve(
+        self,
+        endpoint: str,
+        proxy: Optional[str] = None,
+        account: Optional[str] = None,
+    ) -> float:
+        """预约一次请求，返回需要等待的秒数"""
+        self._compile()
+        _, egress_limit, account_limit, account_burst = self._source  # type: ignore
+
+        endpoint_limit = self._endpoint_limits.get(
+            endpoint, self._endpoint_limits.get("default", 0)
+        )
+        buckets = [
+            self._get_bucket("endpoint", endpoint, endpoint_limit),
+            self._get_bucket("egress", proxy or "", egress_limit),
+        ]
+        if account:
+            buckets.append(
+                self._get_bucket("account", account, account_limit, account_burst)
+            )
+        return max((b.reserve() for b in buckets if b is not None), default=0)
+
+    async def acquire(
+        self,
+        endpoint: str,
+        proxy: Optional[str] = None,
+        account: Optional[str] = None,
+    ):
+        wait = self.reserve(endpoint, proxy, account)
+        if wait > 0:
+            # 加入随机抖动，避免同一账号的请求以固定间隔发出
+            wait *= random.uniform(1, 1.5)
+            logger.debug(f"[RoverSign] 限速 endpoint: {endpoint} 等待{wait:.2f}秒")
+            await pacer_sleep(wait)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,174 @@
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# 时间轮刻度（秒）与槽数，一圈 60 秒，更长的等待记录圈数
+WHEEL_TICK = 0.1
+WHEEL_SIZE = 600
+
+
+class TimerWheel:
+    """
+    哈希时间轮
+    大量账号的短等待只挂在一个 ticker 上，按刻度批量唤醒
+    """
+
+    def __init__(self, tick: float = WHEEL_TICK, size: int = WHEEL_SIZE):
+        self.tick = tick
+        self.size = size
+        self._slots: List[List[Tuple[int, asyncio.Future]]] = [[] for _ in range(size)]
+        self._cursor = 0
+        self._pending = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, delay: float) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        ticks = max(1, round(delay / self.tick))
+        # 偏移取 1..size，整圈的等待不会落在当前刻度上多等一圈
+        rounds = (ticks - 1) // self.size
+        offset = (ticks - 1) % self.size + 1
+        self._slots[(self._cursor + offset) % self.size].append((rounds, future))
+        self._pending += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while self._pending:
+            next_tick += self.tick
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+            self._cursor = (self._cursor + 1) % self.size
+            remain = []
+            for rounds, future in self._slots[self._cursor]:
+                if rounds > 0:
+                    remain.append((rounds - 1, future))
+                    continue
+                self._pending -= 1
+                if not future.done():
+                    future.set_result(None)
+            self._slots[self._cursor] = remain
+
+    async def sleep(self, delay: float):
+        if delay <= 0:
+            return
+        await self.schedule(delay)
+
+
+class _Slot:
+    """
+    一个账号占用的执行槽位
+    账号内并发的子任务共享同一个槽位，全部都在等待时才交出
+    """
+
+    def __init__(self, pacer: "Pacer"):
+        self.pacer = pacer
+        self.members = 1
+        self.sleeping = 0
+        self.held = True
+        self._lock = asyncio.Lock()
+
+    async def maybe_release(self):
+        async with self._lock:
+            if self.held and self.sleeping >= self.members:
+                self.held = False
+                await self.pacer._release()
+
+    async def ensure_held(self):
+        async with self._lock:
+            if not self.held:
+                await self.pacer._acquire()
+                self.held = True
+
+    async def sleep(self, delay: float):
+        self.sleeping += 1
+        try:
+            await self.maybe_release()
+            await self.pacer.wheel.sleep(delay)
+        finally:
+            self.sleeping -= 1
+            await self.ensure_held()
+
+    async def close(self):
+        async with self._lock:
+            if self.held:
+                self.held = False
+                await self.pacer._release()
+
+
+class Pacer:
+    """
+    执行槽位调度
+    账号只在真正执行时占用槽位，按节奏等待时交出槽位，让其他账号的就绪动作先执行
+    limit_func 返回当前允许同时执行的数量，可在运行中调整
+    """
+
+    def __init__(self, limit_func: Callable[[], int]):
+        self.limit_func = limit_func
+        self.wheel = TimerWheel()
+        self.active = 0
+        self._cond = asyncio.Condition()
+
+    async def _acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < max(1, self.limit_func()))
+            self.active += 1
+
+    async def _release(self):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self._acquire()
+        slot = _Slot(self)
+        token = _current_slot.set(slot)
+        try:
+            yield
+        finally:
+            _current_slot.reset(token)
+            await slot.close()
+
+
+_current_slot: ContextVar[Optional[_Slot]] = ContextVar(
+    "rover_pacer_slot", default=None
+)
+
+
+async def pacer_sleep(delay: float):
+    """在执行槽位内等待时交出槽位，否则与 asyncio.sleep 相同"""
+    if delay <= 0:
+        return
+    slot = _current_slot.get()
+    if slot is None:
+        await asyncio.sleep(delay)
+    else:
+        await slot.sleep(delay)
+
+
+async def pacer_gather(*aws: Awaitable[T]) -> List[T]:
+    """账号内并发执行，子任务共享当前槽位"""
+    slot = _current_slot.get()
+    if slot is None or not aws:
+        return list(await asyncio.gather(*aws))
+
+    async def member(aw: Awaitable[T]) -> T:
+        try:
+            return await aw
+        finally:
+            slot.members -= 1
+            await slot.maybe_release()
+
+    # 等待子任务期间，调用方自身视为等待中
+    slot.members += len(aws)
+    slot.sleeping += 1
+    try:
+        return list(await asyncio.gather(*(member(aw) for aw in aws)))
+    finally:
+        slot.sleeping -= 1
+        await slot.ensure_held()
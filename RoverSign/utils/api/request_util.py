@@ -1,5 +1,16 @@
+import asyncio
 from enum import IntEnum
-from typing import Any, Dict, Generic, Optional, TypeVar, Union
+from types import MappingProxyType
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    Iterable,
+    Mapping,
+    Optional,
+    TypeVar,
+    Union,
+)
 
 from pydantic import (
     BaseModel,
@@ -11,27 +22,70 @@ from pydantic import (
 
 from gsuid_core.logger import logger
 
-from ...utils.util import generate_random_string, get_public_ip
+from ...utils.util import (
+    DEFAULT_PUBLIC_IP,
+    generate_random_string,
+    get_public_ip,
+)
+from .route import get_current_endpoint, proxy_router
 
 KURO_VERSION = "2.8.0"
 PLATFORM_SOURCE = "ios"
 CONTENT_TYPE = "application/x-www-form-urlencoded; charset=utf-8"
+USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 18_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko)  KuroGameBox/2.8.0"
+
+
+class HeaderTemplate:
+    """按出口代理预先生成的只读基础请求头，出口IP在后台刷新"""
+
+    def __init__(self):
+        self._templates: Dict[str, Mapping[str, str]] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _build(ip: str) -> Mapping[str, str]:
+        return MappingProxyType(
+            {
+                "source": PLATFORM_SOURCE,
+                "Content-Type": CONTENT_TYPE,
+                "User-Agent": f" {USER_AGENT}",
+                "version": KURO_VERSION,  # getPostDetail 需要版本号
+                "devCode": f"{ip}, {USER_AGENT}",
+            }
+        )
+
+    async def refresh(self, proxy: Optional[str] = None):
+        key = proxy or ""
+        ip = await get_public_ip(proxy=proxy)
+        if ip == DEFAULT_PUBLIC_IP and key in self._templates:
+            # 获取失败时保留上一次的出口IP
+            return
+        self._templates[key] = self._build(ip)
+        logger.debug(f"[RoverSign] 出口IP已刷新 proxy: {proxy} ip: {ip}")
+
+    async def refresh_all(self, proxies: Iterable[Optional[str]]):
+        get_public_ip.cache.clear()
+        for proxy in set(proxies):
+            await self.refresh(proxy)
+
+    async def get(self, proxy: Optional[str] = None) -> Dict[str, str]:
+        template = self._templates.get(proxy or "")
+        if template is None:
+            async with self._lock:
+                if (proxy or "") not in self._templates:
+                    await self.refresh(proxy)
+            template = self._templates[proxy or ""]
+        return dict(template)
+
+
+header_template = HeaderTemplate()
 
 
 async def get_base_header(devCode: Optional[str] = None):
-    header = {
-        "source": PLATFORM_SOURCE,
-        "Content-Type": CONTENT_TYPE,
-        "User-Agent": " Mozilla/5.0 (iPhone; CPU iPhone OS 18_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko)  KuroGameBox/2.8.0",
-        "version": KURO_VERSION,  # getPostDetail 需要版本号
-    }
+    proxy_url = proxy_router.route(get_current_endpoint())
+    header = await header_template.get(proxy_url)
     if devCode:
         header["devCode"] = devCode
-    else:
-        ip = await get_public_ip()
-        header["devCode"] = (
-            f"{ip}, Mozilla/5.0 (iPhone; CPU iPhone OS 18_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko)  KuroGameBox/2.8.0"
-        )
     return header
 
 
@@ -52,6 +106,7 @@ class ThrowMsg(str):
     DANGER_ENV = "当前环境存在风险无法进行操作，请切换网络环境后重试"
     SERVER_ERROR = "请求服务器失败，已达最大重试次数"
     SYSTEM_BUSY = "系统繁忙，请稍后再试"
+    CIRCUIT_OPEN = "接口暂时不可用，请稍后再试"
 
 
 class RespCode(IntEnum):
@@ -89,10 +144,9 @@ def check_send_master_info(code: int, msg: str, data: Optional[T] = None) -> boo
     if code in NOT_SEND_MASTER_INFO_CODES:
         return False
 
-    import inspect
-
-    callers = [f.function for f in inspect.stack()[5:8][::-1]]
-    logger.warning(f"[rover] {'.'.join(callers)} code: {code} msg: {msg} data: {data}")
+    logger.warning(
+        f"[rover] {get_current_endpoint()} code: {code} msg: {msg} data: {data}"
+    )
     return isinstance(msg, str) and msg != ""
 
 
@@ -131,7 +185,8 @@ class KuroApiResp(BaseModel, Generic[T]):
     def is_bat_token_invalid(self) -> bool:
         if self.code == RespCode.BAT_TOKEN_INVALID.value:
             return True
-        return self.msg in ("数据令牌已失效")
+        # 非 JSON 响应的 msg 为空，不能算作 bat 失效
+        return bool(self.msg) and self.msg == ThrowMsg.BAT_TOKEN_INVALID
 
     @model_validator(mode="after")
     def _post_validate(self) -> "KuroApiResp[T]":
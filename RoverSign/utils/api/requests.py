@@ -1,16 +1,9 @@
-import asyncio
-import inspect
 import json
+import time
 from datetime import datetime
 from typing import Any, Dict, List, Literal, Mapping, Optional, Union
 
-from aiohttp import (
-    ClientSession,
-    ClientTimeout,
-    ContentTypeError,
-    FormData,
-    TCPConnector,
-)
+from aiohttp import ClientTimeout, ContentTypeError, FormData
 
 from gsuid_core.logger import logger
 
@@ -30,18 +23,62 @@ from ..api.api import (
     SIGN_IN_URL,
     SIGNIN_TASK_LIST_URL,
     SIGNIN_URL,
-    get_local_proxy_url,
-    get_need_proxy_func,
 )
+from ..bat_token import BatTokenManager
+from ..cache import async_ttl_cache
+from ..credential import credential_cache, token_health
 from ..database.models import WavesUser
-from ..errors import ROVER_CODE_999
-from ..util import timed_async_cache
-from .request_util import KURO_VERSION, KuroApiResp, get_base_header
+from ..errors import ROVER_CODE_999, ROVER_CODE_999_MSG
+from .adaptive import adaptive_controller
+from .flow import (
+    bind_flow_account,
+    flow_cached,
+    flow_write,
+    get_flow_account,
+    get_paced_account,
+    invalidate_flow,
+    request_flow,
+)
+from .limiter import rate_limiter
+from .pacer import pacer_sleep
+from .request_util import (
+    KURO_VERSION,
+    KuroApiResp,
+    ThrowMsg,
+    get_base_header,
+    header_template,
+)
+from .retry import (
+    RETRYABLE_EXCEPTIONS,
+    RetryableHTTPError,
+    backoff_delay,
+    circuit_breakers,
+    is_retryable_resp,
+)
+from .route import endpoint, get_current_endpoint, proxy_router
+from .session import SessionPool
 
 
 class RoverRequest:
     ssl_verify = True
 
+    def __init__(self):
+        self.session_pool = SessionPool(ssl_verify=self.ssl_verify)
+        self.bat_manager = BatTokenManager(self)
+
+    async def start(self):
+        """解析各出口IP并预热连接池"""
+        proxies = proxy_router.egress_proxies()
+        await header_template.refresh_all(proxies)
+        for proxy in proxies:
+            await self.session_pool.get(proxy)
+
+    async def refresh_header_template(self):
+        await header_template.refresh_all(proxy_router.egress_proxies())
+
+    async def close(self):
+        await self.session_pool.close()
+
     def is_net(self, roleId):
         _temp = int(roleId)
         return _temp >= 200000000
@@ -55,21 +92,14 @@ class RoverRequest:
             return SERVER_ID
 
     async def refresh_bat_token(self, waves_user: WavesUser):
-        success, access_token = await self.get_request_token(
+        access_token = await self.bat_manager.refresh(
             waves_user.uid, waves_user.cookie, waves_user.did
         )
-        if not success:
+        if not access_token:
             return waves_user
 
         waves_user.bat = access_token
-        await WavesUser.update_data_by_data(
-            select_data={
-                # "user_id": waves_user.user_id,
-                # "bot_id": waves_user.bot_id,
-                "uid": waves_user.uid,
-            },
-            update_data={"bat": access_token},
-        )
+        invalidate_flow()
         return waves_user
 
     async def get_used_headers(
@@ -82,20 +112,54 @@ class RoverRequest:
         }
         if needToken:
             headers["token"] = cookie
-        waves_user: Optional[WavesUser] = await WavesUser.select_data_by_cookie_and_uid(
-            cookie=cookie,
-            uid=uid,
-        ) or await WavesUser.select_data_by_cookie(
-            cookie=cookie,
-        )
 
-        if not waves_user:
-            return headers
+        credential = credential_cache.get(uid, cookie)
+        if credential is None:
+            waves_user: Optional[
+                WavesUser
+            ] = await WavesUser.select_data_by_cookie_and_uid(
+                cookie=cookie,
+                uid=uid,
+            ) or await WavesUser.select_data_by_cookie(
+                cookie=cookie,
+            )
+            if not waves_user:
+                return headers
+            credential = credential_cache.set(
+                uid, cookie, waves_user.did, waves_user.bat
+            )
 
-        headers["did"] = waves_user.did or ""
-        headers["b-at"] = waves_user.bat or ""
+        headers["did"] = credential.did
+        headers["b-at"] = credential.bat
         return headers
 
+    def flow(self, uid: str = "", cookie: str = "", paced: bool = False):
+        """
+        单个账号的一次签到流程，流程内复用幂等读接口的结果
+        paced 为 True 时计入单账号限速
+        """
+        return request_flow(uid, cookie, paced)
+
+    async def check_token(self, waves_user: WavesUser) -> KuroApiResp:
+        """
+        login_log + refresh_data 预检
+        TokenHealthTTL 内校验通过的 (uid, cookie) 直接跳过
+        """
+        uid, cookie = waves_user.uid, waves_user.cookie
+        bind_flow_account(uid, cookie)
+        if token_health.is_healthy(uid, cookie):
+            return KuroApiResp.ok()
+
+        data = await self.login_log(uid, cookie)
+        if not data.success:
+            return data
+        data = await self.refresh_data(uid, cookie)
+        if not data.success:
+            return data
+
+        token_health.mark_healthy(uid, cookie)
+        return data
+
     async def get_self_waves_ck(
         self, uid: str, user_id: str, bot_id: str
     ) -> Optional[str]:
@@ -107,22 +171,19 @@ class RoverRequest:
         if waves_user.status == "无效":
             return ""
 
-        data = await self.login_log(uid, waves_user.cookie)
+        data = await self.check_token(waves_user)
+        if not data.success and data.is_bat_token_invalid:
+            # 不在签到流程内时没有就地刷新，这里刷新后重新校验
+            if await self.bat_manager.refresh(uid, waves_user.cookie, waves_user.did):
+                data = await self.check_token(waves_user)
         if not data.success:
             await data.mark_cookie_invalid(uid, waves_user.cookie)
             return ""
 
-        data = await self.refresh_data(uid, waves_user.cookie)
-        if not data.success:
-            if data.is_bat_token_invalid:
-                if waves_user := await self.refresh_bat_token(waves_user):
-                    return waves_user.cookie
-            else:
-                await data.mark_cookie_invalid(uid, waves_user.cookie)
-            return ""
-
         return waves_user.cookie
 
+    @flow_cached
+    @endpoint("refresh_data")
     async def refresh_data(
         self, roleId: str, token: str, serverId: Optional[str] = None
     ):
@@ -137,6 +198,8 @@ class RoverRequest:
         }
         return await self._waves_request(REFRESH_URL, "POST", header, data=data)
 
+    @flow_cached
+    @endpoint("login_log")
     async def login_log(self, roleId: str, token: str):
         """登录校验"""
         header = await get_base_header()
@@ -152,6 +215,7 @@ class RoverRequest:
         data = {}
         return await self._waves_request(LOGIN_LOG_URL, "POST", header, data=data)
 
+    @endpoint("get_request_token")
     async def get_request_token(
         self, roleId: str, token: str, did: str, serverId: Optional[str] = None
     ) -> tuple[bool, str]:
@@ -175,6 +239,7 @@ class RoverRequest:
 
         return False, ""
 
+    @endpoint("get_daily_info")
     async def get_daily_info(
         self, roleId: str, token: str, gameId: Union[str, int] = GAME_ID
     ):
@@ -196,6 +261,8 @@ class RoverRequest:
             data=data,
         )
 
+    @flow_write
+    @endpoint("sign_in")
     async def sign_in(self, roleId: str, token: str):
         """游戏签到"""
         header = await get_base_header()
@@ -212,6 +279,8 @@ class RoverRequest:
         }
         return await self._waves_request(SIGNIN_URL, "POST", header, data=data)
 
+    @flow_cached
+    @endpoint("sign_in_task_list")
     async def sign_in_task_list(
         self, roleId: str, token: str, serverId: Optional[str] = None
     ):
@@ -231,6 +300,8 @@ class RoverRequest:
             SIGNIN_TASK_LIST_URL, "POST", header, data=data
         )
 
+    @flow_cached
+    @endpoint("get_task")
     async def get_task(self, token: str, roleId: str):
         try:
             header = await get_base_header()
@@ -243,22 +314,25 @@ class RoverRequest:
         except Exception as e:
             logger.exception(f"get_task token {token}", e)
 
-    @timed_async_cache(
+    @async_ttl_cache(
         3600,
-        lambda x: x and isinstance(x, dict) and x.get("code") == 200,
+        lambda x: x is not None and x.success,
+        maxsize=256,
+        negative_ttl=30,
     )
-    async def get_form_list(self, token: str):
+    @endpoint("get_form_list")
+    async def get_form_list(self, token: str, forumId: str = "9", pageIndex: int = 1):
         try:
             header = await get_base_header()
             used_headers = await self.get_used_headers(cookie=token, uid="")
             header.update(used_headers)
             header.update({"version": "2.25"})
             data = {
-                "pageIndex": "1",
+                "pageIndex": str(pageIndex),
                 "pageSize": "20",
                 "timeType": "0",
                 "searchType": "1",
-                "forumId": "9",
+                "forumId": forumId,
                 "gameId": "3",
             }
             return await self._waves_request(FORUM_LIST_URL, "POST", header, data=data)
@@ -275,6 +349,8 @@ class RoverRequest:
     #     except Exception as e:
     #         logger.exception(f"get_gold token {token}", e)
 
+    @flow_write
+    @endpoint("do_like")
     async def do_like(self, roleId: str, token: str, postId, toUserId):
         """点赞"""
         try:
@@ -294,6 +370,8 @@ class RoverRequest:
         except Exception as e:
             logger.exception(f"do_like token {token}", e)
 
+    @flow_write
+    @endpoint("do_sign_in")
     async def do_sign_in(self, roleId: str, token: str):
         """签到"""
         try:
@@ -307,6 +385,8 @@ class RoverRequest:
         except Exception as e:
             logger.exception(f"do_sign_in token {token}", e)
 
+    @flow_write
+    @endpoint("do_post_detail")
     async def do_post_detail(self, roleId: str, token: str, postId: str):
         """浏览"""
         try:
@@ -327,6 +407,8 @@ class RoverRequest:
         except Exception as e:
             logger.exception(f"do_post_detail token {token}", e)
 
+    @flow_write
+    @endpoint("do_share")
     async def do_share(self, roleId: str, token: str):
         """分享"""
         try:
@@ -366,46 +448,117 @@ class RoverRequest:
         if header is None:
             header = await get_base_header()
 
-        proxy_func = get_need_proxy_func()
-        if inspect.stack()[1].function in proxy_func or "all" in proxy_func:
-            proxy_url = get_local_proxy_url()
-        else:
-            proxy_url = None
+        resp_data = await self._send_request(
+            url, method, header, params, json_data, data, max_retries, retry_delay
+        )
+        if not (resp_data.is_token_invalid or resp_data.is_bat_token_invalid):
+            return resp_data
+
+        account = get_flow_account()
+        if account is None:
+            return resp_data
+        token_health.invalidate(*account)
+
+        # bat 失效：就地刷新后重放一次
+        if (
+            resp_data.is_bat_token_invalid
+            and "b-at" in header
+            and get_current_endpoint() != "get_request_token"
+        ):
+            access_token = await self.bat_manager.refresh(*account)
+            if access_token:
+                invalidate_flow()
+                logger.info(f"[RoverSign] UID{account[0]} bat令牌已刷新，重放请求")
+                header = {**header, "b-at": access_token}
+                resp_data = await self._send_request(
+                    url,
+                    method,
+                    header,
+                    params,
+                    json_data,
+                    data,
+                    max_retries,
+                    retry_delay,
+                )
+        return resp_data
+
+    async def _send_request(
+        self,
+        url: str,
+        method: Literal["GET", "POST"],
+        header: Mapping[str, str],
+        params: Optional[Dict[str, Any]],
+        json_data: Optional[Dict[str, Any]],
+        data: Optional[Union[FormData, Dict[str, Any]]],
+        max_retries: int,
+        retry_delay: float,
+    ) -> KuroApiResp[Union[str, Dict[str, Any], List[Any]]]:
+        name = get_current_endpoint()
+        proxy_url = proxy_router.route(name)
+        paced_uid = get_paced_account()
+        breaker = circuit_breakers.get(name)
 
+        resp_data: Optional[KuroApiResp[Any]] = None
         for attempt in range(max_retries):
+            if not breaker.allow():
+                logger.warning(f"[RoverSign] 接口 {name} 熔断中，跳过请求")
+                return KuroApiResp[Any].err(ThrowMsg.CIRCUIT_OPEN, code=ROVER_CODE_999)
+
+            await rate_limiter.acquire(name, proxy_url, paced_uid)
+            start = time.monotonic()
             try:
-                async with ClientSession(
-                    connector=TCPConnector(verify_ssl=self.ssl_verify)
-                ) as client:
-                    async with client.request(
-                        method,
-                        url=url,
-                        headers=header,
-                        params=params,
-                        json=json_data,
-                        data=data,
-                        proxy=proxy_url,
-                        timeout=ClientTimeout(10),
-                    ) as resp:
+                client = await self.session_pool.get(proxy_url)
+                async with client.request(
+                    method,
+                    url=url,
+                    headers=header,
+                    params=params,
+                    json=json_data,
+                    data=data,
+                    proxy=proxy_url,
+                    timeout=ClientTimeout(10),
+                ) as resp:
+                    if resp.status >= 500:
+                        raise RetryableHTTPError(f"HTTP {resp.status}")
+                    try:
+                        raw_data = await resp.json()
+                    except ContentTypeError:
+                        _raw_data = await resp.text()
+                        raw_data = {"code": ROVER_CODE_999, "data": _raw_data}
+                    if isinstance(raw_data, dict):
                         try:
-                            raw_data = await resp.json()
-                        except ContentTypeError:
-                            _raw_data = await resp.text()
-                            raw_data = {"code": ROVER_CODE_999, "data": _raw_data}
-                        if isinstance(raw_data, dict):
-                            try:
-                                raw_data["data"] = json.loads(raw_data.get("data", ""))
-                            except Exception:
-                                pass
-                        logger.debug(
-                            f"url:[{url}] params:[{params}] headers:[{header}] data:[{data}] raw_data:{raw_data}"
-                        )
-                        return KuroApiResp[Any].model_validate(raw_data)
+                            raw_data["data"] = json.loads(raw_data.get("data", ""))
+                        except Exception:
+                            pass
+                    logger.debug(
+                        f"url:[{url}] params:[{params}] headers:[{header}] data:[{data}] raw_data:{raw_data}"
+                    )
+                    resp_data = KuroApiResp[Any].model_validate(raw_data)
+            except (RetryableHTTPError, *RETRYABLE_EXCEPTIONS) as e:
+                adaptive_controller.record(time.monotonic() - start, error=True)
+                breaker.record_failure()
+                logger.warning(f"url:[{url}] attempt {attempt + 1} failed: {e!r}")
             except Exception as e:
+                # 其余异常重试也无济于事
                 logger.exception(f"url:[{url}] attempt {attempt + 1} failed", e)
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-
+                return KuroApiResp[Any].err(ROVER_CODE_999_MSG, code=ROVER_CODE_999)
+            else:
+                adaptive_controller.record(
+                    time.monotonic() - start, resp_data.code, resp_data.msg
+                )
+                if not is_retryable_resp(resp_data):
+                    breaker.record_success()
+                    return resp_data
+                breaker.record_failure()
+                logger.warning(
+                    f"url:[{url}] attempt {attempt + 1} busy: {resp_data.msg}"
+                )
+
+            if attempt < max_retries - 1:
+                await pacer_sleep(backoff_delay(attempt, retry_delay))
+
+        if resp_data is not None:
+            return resp_data
         return KuroApiResp[Any].err(
             "请求服务器失败，已达最大重试次数", code=ROVER_CODE_999
         )
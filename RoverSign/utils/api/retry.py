@@ -0,0 +1,116 @@
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+from aiohttp import ClientError
+
+from gsuid_core.logger import logger
+
+from .request_util import KuroApiResp, RespCode, ThrowMsg
+
+# 退避上限（秒）
+RETRY_MAX_DELAY = 30
+# 连续失败多少次后熔断
+BREAKER_FAILURE_THRESHOLD = 5
+# 熔断后多久放行一次探测请求（秒）
+BREAKER_RESET_TIMEOUT = 30
+
+# 可重试的网络异常
+RETRYABLE_EXCEPTIONS = (asyncio.TimeoutError, ClientError)
+
+
+class RetryableHTTPError(Exception):
+    """服务端 5xx，可重试"""
+
+
+def is_retryable_resp(resp: KuroApiResp) -> bool:
+    """服务端繁忙类返回可重试；token 失效、风控等业务错误重试无意义"""
+    return resp.code == RespCode.SERVER_ERROR.value or resp.msg == ThrowMsg.SYSTEM_BUSY
+
+
+def backoff_delay(attempt: int, base: float) -> float:
+    """指数退避，取 [1/2, 1] 区间的随机抖动"""
+    delay = min(RETRY_MAX_DELAY, base * 2**attempt)
+    return delay * random.uniform(0.5, 1)
+
+
+class CircuitBreaker:
+    """
+    单个接口的熔断器
+    连续失败达到阈值后打开，期间直接失败；
+    每隔 BREAKER_RESET_TIMEOUT 放行一个探测请求，成功即恢复
+    """
+
+    CLOSED = "关闭"
+    OPEN = "熔断"
+    HALF_OPEN = "探测中"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if now - self._opened_at >= BREAKER_RESET_TIMEOUT:
+            # 放行一个探测请求，其余请求等下一个周期
+            self.state = self.HALF_OPEN
+            self._opened_at = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"[RoverSign] 接口 {self.name} 已恢复，关闭熔断")
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            return
+
+        self.failures += 1
+        if self.state == self.CLOSED and self.failures >= BREAKER_FAILURE_THRESHOLD:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.trips += 1
+            logger.warning(
+                f"[RoverSign] 接口 {self.name} 连续失败{self.failures}次，"
+                f"熔断{BREAKER_RESET_TIMEOUT}秒"
+            )
+
+
+class CircuitBreakerRegistry:
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(name)
+        return breaker
+
+    def reset_stats(self):
+        """每次自动签到开始时清空熔断次数统计，不影响当前状态"""
+        for breaker in self._breakers.values():
+            breaker.trips = 0
+            breaker.rejected = 0
+
+    def summary(self) -> List[str]:
+        return [
+            f"接口 {b.name} 熔断{b.trips}次 拒绝{b.rejected}次 当前{b.state}"
+            for b in self._breakers.values()
+            if b.trips or b.state != CircuitBreaker.CLOSED
+        ]
+
+
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,68 @@
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional, Set, Tuple
+
+from gsuid_core.logger import logger
+
+from .api import get_local_proxy_url, get_need_proxy_func
+
+_current_endpoint: ContextVar[str] = ContextVar("rover_endpoint", default="")
+
+
+def endpoint(name: str):
+    """声明 RoverRequest 方法对应的接口名"""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = _current_endpoint.set(name)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _current_endpoint.reset(token)
+
+        setattr(wrapper, "endpoint", name)
+        return wrapper
+
+    return decorator
+
+
+def get_current_endpoint() -> str:
+    return _current_endpoint.get()
+
+
+class ProxyRouter:
+    """将 NeedProxyFunc 编译为 接口名 -> 代理 的查找表，配置变化时重建"""
+
+    def __init__(self):
+        self._source: Optional[Tuple[Tuple[str, ...], Optional[str]]] = None
+        self._table: Dict[str, Optional[str]] = {}
+        self._default: Optional[str] = None
+
+    def _compile(self):
+        source = (tuple(get_need_proxy_func()), get_local_proxy_url())
+        if source == self._source:
+            return
+
+        need_proxy_func, proxy_url = source
+        self._table = {name: proxy_url for name in need_proxy_func}
+        self._default = proxy_url if "all" in need_proxy_func else None
+        self._source = source
+        logger.debug(
+            f"[RoverSign] 代理路由表已重建 proxy: {proxy_url} "
+            f"endpoints: {list(need_proxy_func)}"
+        )
+
+    def egress_proxies(self) -> Set[Optional[str]]:
+        """当前配置下会用到的全部出口代理"""
+        self._compile()
+        return {self._default, *self._table.values()}
+
+    def route(self, name: str) -> Optional[str]:
+        self._compile()
+        proxy_url = self._table.get(name, self._default)
+        logger.debug(f"[RoverSign] 代理路由 endpoint: {name} proxy: {proxy_url}")
+        return proxy_url
+
+
+proxy_router = ProxyRouter()
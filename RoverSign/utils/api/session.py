@@ -0,0 +1,84 @@
+import asyncio
+from typing import Dict, Optional
+
+from aiohttp import ClientSession, TCPConnector, TraceConfig
+
+from gsuid_core.logger import logger
+
+
+def get_pool_config():
+    from ...roversign_config.roversign_config import RoverSignConfig
+
+    limit: int = RoverSignConfig.get_config("HttpPoolLimit").data
+    limit_per_host: int = RoverSignConfig.get_config("HttpPoolLimitPerHost").data
+    keepalive: int = RoverSignConfig.get_config("HttpKeepAliveTimeout").data
+    return limit, limit_per_host, keepalive
+
+
+class SessionPool:
+    """按出口代理复用的长连接池，每个代理一个 ClientSession"""
+
+    def __init__(self, ssl_verify: bool = True):
+        self.ssl_verify = ssl_verify
+        self._sessions: Dict[str, ClientSession] = {}
+        self._lock = asyncio.Lock()
+        self.stats = {"sessions": 0, "created": 0, "reused": 0}
+
+    def _build_trace_config(self) -> TraceConfig:
+        trace_config = TraceConfig()
+
+        async def on_create(session, ctx, params):
+            self.stats["created"] += 1
+
+        async def on_reuse(session, ctx, params):
+            self.stats["reused"] += 1
+
+        trace_config.on_connection_create_end.append(on_create)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        return trace_config
+
+    def _build_session(self) -> ClientSession:
+        limit, limit_per_host, keepalive = get_pool_config()
+        connector = TCPConnector(
+            ssl=self.ssl_verify,
+            limit=limit,
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive,
+            ttl_dns_cache=300,
+        )
+        return ClientSession(
+            connector=connector,
+            trace_configs=[self._build_trace_config()],
+        )
+
+    async def get(self, proxy: Optional[str] = None) -> ClientSession:
+        key = proxy or ""
+        session = self._sessions.get(key)
+        if session and not session.closed:
+            return session
+
+        async with self._lock:
+            session = self._sessions.get(key)
+            if session and not session.closed:
+                return session
+            session = self._build_session()
+            self._sessions[key] = session
+            self.stats["sessions"] += 1
+            logger.debug(f"[RoverSign] 创建连接池 proxy: {proxy}")
+            return session
+
+    def reuse_ratio(self) -> float:
+        total = self.stats["created"] + self.stats["reused"]
+        return self.stats["reused"] / total if total else 0.0
+
+    async def close(self):
+        async with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+        logger.info(
+            f"[RoverSign] 连接池已关闭 新建连接: {self.stats['created']} "
+            f"复用连接: {self.stats['reused']} 复用率: {self.reuse_ratio():.1%}"
+        )
@@ -0,0 +1,89 @@
+import time
+from typing import TYPE_CHECKING, Optional
+
+from gsuid_core.logger import logger
+
+from .cache import AsyncTTLCache
+from .credential import credential_cache, token_health
+from .database.models import RoverSignBatToken, WavesUser
+
+if TYPE_CHECKING:
+    from .api.requests import RoverRequest
+
+# 同一账号刷新结果复用时间（秒），并发遇到 10903 时只刷新一次
+BAT_REFRESH_REUSE = 60
+# 签到前多少分钟刷新 bat 令牌
+BAT_PREFRESH_LEAD = 30
+# 除提前量外再预留的签到执行时长（分钟）
+BAT_PREFRESH_RUN_MARGIN = 60
+
+
+def get_bat_token_max_age() -> float:
+    from ..roversign_config.roversign_config import RoverSignConfig
+
+    return RoverSignConfig.get_config("BatTokenMaxAge").data * 3600
+
+
+def get_bat_stale_margin() -> float:
+    """
+    提前刷新的余量：每天一次的预刷新在令牌到期前就要刷新，
+    余量覆盖提前量与整个签到执行时长（含窗口模式）
+    """
+    from ..roversign_config.roversign_config import RoverSignConfig
+
+    minutes = BAT_PREFRESH_LEAD + BAT_PREFRESH_RUN_MARGIN
+    if RoverSignConfig.get_config("SignWindow").data:
+        minutes += RoverSignConfig.get_config("SignWindowMinutes").data
+    return minutes * 60
+
+
+class BatTokenManager:
+    """
+    bat 令牌管理
+    每个账号 bat 的刷新时间记录在 RoverSignBatToken，签到前后台刷新过旧的令牌；
+    请求遇到 10903 时就地刷新，由 RoverRequest 重放一次
+    """
+
+    def __init__(self, request: "RoverRequest"):
+        self._request = request
+        self._results = AsyncTTLCache(
+            BAT_REFRESH_REUSE, maxsize=4096, negative_ttl=BAT_REFRESH_REUSE
+        )
+
+    def is_stale(self, waves_user: WavesUser, refreshed_at: Optional[int]) -> bool:
+        """refreshed_at 为空表示没有刷新记录，按过旧处理"""
+        if not waves_user.bat or not refreshed_at:
+            return True
+        age = time.time() - refreshed_at
+        return age >= get_bat_token_max_age() - get_bat_stale_margin()
+
+    async def refresh(
+        self, uid: str, cookie: str, did: Optional[str] = None
+    ) -> Optional[str]:
+        """刷新 bat，成功返回新令牌"""
+        return await self._results.get_or_load(
+            (uid, cookie), lambda: self._refresh(uid, cookie, did), bool
+        )
+
+    async def _refresh(
+        self, uid: str, cookie: str, did: Optional[str]
+    ) -> Optional[str]:
+        if did is None:
+            headers = await self._request.get_used_headers(cookie=cookie, uid=uid)
+            did = headers["did"]
+
+        success, access_token = await self._request.get_request_token(uid, cookie, did)
+        if not success:
+            logger.warning(f"[RoverSign] UID{uid} bat令牌刷新失败")
+            return None
+
+        await WavesUser.update_data_by_data(
+            select_data={"uid": uid},
+            update_data={"bat": access_token},
+        )
+        credential_cache.invalidate_uid(uid)
+        # 能用 token 换到 bat 说明登录有效，签到时可跳过预检
+        token_health.mark_healthy(uid, cookie)
+        await RoverSignBatToken.mark_refreshed(uid, int(time.time()))
+        logger.debug(f"[RoverSign] UID{uid} bat令牌已刷新")
+        return access_token
@@ -1,91 +1,302 @@
 import asyncio
+import json
 import random
+import time
+from base64 import b64decode, b64encode
+from typing import Any, Dict, List, Literal, NamedTuple, Optional, Tuple
+from uuid import uuid4
 
 from gsuid_core.gss import gss
 from gsuid_core.logger import logger
+from gsuid_core.models import Message
+from gsuid_core.server import on_core_shutdown, on_core_start
 from gsuid_core.subscribe import gs_subscribe
 from gsuid_core.utils.boardcast.models import BoardCastMsgDict
 from gsuid_core.utils.database.models import Subscribe
 
 from ..utils.constant import BoardcastType
+from ..utils.database.models import RoverSignOutbox
 
+TargetType = Literal["direct", "group"]
 
-async def send_board_cast_msg(
-    msgs: BoardCastMsgDict, board_cast_type: BoardcastType
-):
-    logger.info(f"[推送] {board_cast_type} 任务启动...")
-    private_msg_list = msgs["private_msg_dict"]
-    group_msg_list = msgs["group_msg_dict"]
-
-    subs = await gs_subscribe.get_subscribe(board_cast_type)
-
-    def get_bot_self_id(qid, bot_id, target_type, group_id):
-        if not subs:
-            return ""
-        for sub in subs:
-            sub: Subscribe
-            if sub.user_type != target_type:
+# 每个 bot 的每种推送队列各自限速（秒）
+SEND_INTERVAL: Dict[str, Tuple[float, float]] = {
+    "direct": (1.5, 3.5),
+    "group": (1.5, 3.5),
+}
+
+# 推送失败后的重试：第 n 次失败后等待 OUTBOX_RETRY_DELAY * 2^(n-1) 秒
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 30
+OUTBOX_BATCH_SIZE = 200
+OUTBOX_POLL_INTERVAL = 15
+
+
+class SendJob(NamedTuple):
+    target_type: TargetType
+    target_id: str
+    bot_id: str
+    messages: List[Message]
+    outbox_id: Optional[int] = None
+
+
+def dump_messages(messages: List[Message]) -> List[Dict[str, Any]]:
+    result = []
+    for message in messages:
+        data = message.data
+        if isinstance(data, bytes):
+            result.append(
+                {"type": message.type, "data": b64encode(data).decode(), "bytes": True}
+            )
+        elif isinstance(data, list) and data and isinstance(data[0], Message):
+            result.append({"type": message.type, "data": dump_messages(data)})
+        else:
+            result.append({"type": message.type, "data": data})
+    return result
+
+
+def load_messages(raw: List[Dict[str, Any]]) -> List[Message]:
+    result = []
+    for item in raw:
+        data = item["data"]
+        if item.get("bytes"):
+            data = b64decode(data)
+        elif isinstance(data, list) and data and isinstance(data[0], dict):
+            data = load_messages(data)
+        result.append(Message(type=item["type"], data=data))
+    return result
+
+
+class SubscribeIndex:
+    """订阅按 (user_type, user_id/group_id, bot_id) 建立索引"""
+
+    def __init__(self, subs: Optional[List[Subscribe]]):
+        self._index: Dict[Tuple[str, str, str], str] = {}
+        for sub in subs or []:
+            if sub.user_type == "direct":
+                key = ("direct", sub.user_id, sub.bot_id)
+            elif sub.user_type == "group":
+                key = ("group", sub.group_id or "", sub.bot_id)
+            else:
                 continue
-            if target_type == "direct":
-                if sub.user_id == qid and sub.bot_id == bot_id:
-                    return sub.bot_self_id
+            # 与原先的线性查找一致，取第一条匹配
+            self._index.setdefault(key, sub.bot_self_id)
 
-            if target_type == "group":
-                if sub.group_id == group_id and sub.bot_id == bot_id:
-                    return sub.bot_self_id
-        return ""
+    def get_bot_self_id(self, target_type: str, target_id: str, bot_id: str) -> str:
+        return self._index.get((target_type, target_id, bot_id), "")
 
-    # 执行私聊推送
-    for qid in private_msg_list:
+
+def build_send_jobs(msgs: BoardCastMsgDict) -> List[SendJob]:
+    jobs: List[SendJob] = []
+    for qid, private_msgs in msgs["private_msg_dict"].items():
+        for single in private_msgs:
+            jobs.append(SendJob("direct", qid, single["bot_id"], single["messages"]))
+
+    for gid, group_msg in msgs["group_msg_dict"].items():
+        group_list = group_msg if isinstance(group_msg, list) else [group_msg]
+        for group in group_list:
+            jobs.append(SendJob("group", gid, group["bot_id"], group["messages"]))  # type: ignore
+    return jobs
+
+
+async def _send_queue(
+    bot_id: str,
+    target_type: str,
+    jobs: List[Tuple[int, SendJob]],
+    index: SubscribeIndex,
+    results: Dict[int, Optional[str]],
+):
+    """依次发送一个队列中的消息，results 记录 job 下标 -> 错误信息（成功为 None）"""
+    low, high = SEND_INTERVAL[target_type]
+    for i, (job_index, job) in enumerate(jobs):
+        bot = gss.active_bot.get(bot_id)
+        if bot is None:
+            logger.warning(f"[推送] bot {bot_id} 已断开，剩余推送稍后重试")
+            return
         try:
-            for bot_id in gss.active_bot:
-                for single in private_msg_list[qid]:
-                    bot_self_id = get_bot_self_id(
-                        qid, single["bot_id"], "direct", ""
-                    )
-                    await gss.active_bot[bot_id].target_send(
-                        single["messages"],
-                        "direct",
-                        qid,
-                        single["bot_id"],
-                        bot_self_id,
-                        "",
-                    )
+            await bot.target_send(
+                job.messages,
+                job.target_type,
+                job.target_id,
+                job.bot_id,
+                index.get_bot_self_id(job.target_type, job.target_id, job.bot_id),
+                "",
+            )
+            if results.get(job_index, "") is not None:
+                results[job_index] = None
+                # 成功后立即标记，中途退出时已送达的消息不会重复推送
+                if job.outbox_id is not None:
+                    await RoverSignOutbox.mark_sent([job.outbox_id])
         except Exception as e:
-            logger.exception(f"[推送] {qid} 私聊推送失败!错误信息", e)
-        await asyncio.sleep(0.5 + random.randint(1, 3))
-    logger.info(f"[推送] {board_cast_type} 私聊推送完成!")
+            logger.exception(
+                f"[推送] {job.target_type} {job.target_id} 推送失败!错误信息", e
+            )
+            # 任意一个 bot 推送成功即视为成功
+            results.setdefault(job_index, repr(e))
+        if i < len(jobs) - 1:
+            await asyncio.sleep(random.uniform(low, high))
 
-    # 执行群聊推送
-    for gid in group_msg_list:
-        try:
-            for bot_id in gss.active_bot:
-                if isinstance(group_msg_list[gid], list):
-                    for group in group_msg_list[gid]:
-                        bot_self_id = get_bot_self_id("", group["bot_id"], "group", gid)  # type: ignore
-                        await gss.active_bot[bot_id].target_send(
-                            group["messages"],  # type: ignore
-                            "group",
-                            gid,
-                            group["bot_id"],  # type: ignore
-                            bot_self_id,
-                            "",
-                        )
-                        await asyncio.sleep(0.5 + random.randint(1, 3))
-                else:
-                    bot_self_id = get_bot_self_id(
-                        "", group_msg_list[gid]["bot_id"], "group", gid
-                    )
-                    await gss.active_bot[bot_id].target_send(
-                        group_msg_list[gid]["messages"],
-                        "group",
-                        gid,
-                        group_msg_list[gid]["bot_id"],
-                        bot_self_id,
-                        "",
+
+async def deliver_jobs(
+    jobs: List[SendJob], index: SubscribeIndex
+) -> Dict[int, Optional[str]]:
+    """每个 bot 的私聊、群聊各自一个发送队列，互不阻塞"""
+    results: Dict[int, Optional[str]] = {}
+    queues = []
+    for bot_id in list(gss.active_bot):
+        for target_type in ("direct", "group"):
+            target_jobs = [
+                (i, job) for i, job in enumerate(jobs) if job.target_type == target_type
+            ]
+            if target_jobs:
+                queues.append(
+                    _send_queue(bot_id, target_type, target_jobs, index, results)
+                )
+    await asyncio.gather(*queues)
+    return results
+
+
+class BroadcastDispatcher:
+    """
+    持久化推送队列的后台投递
+    消息先写入 RoverSignOutbox，再由这里按到期时间取出、推送、失败退避重试
+    """
+
+    def __init__(self):
+        self._event = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self):
+        self._event.set()
+
+    async def drain(self):
+        if not gss.active_bot:
+            # 没有可用的 bot 时不消耗重试次数
+            return
+        async with self._lock:
+            while rows := await RoverSignOutbox.claim_due(OUTBOX_BATCH_SIZE):
+                await self._deliver(rows)
+
+    async def _deliver(self, rows: List[RoverSignOutbox]):
+        jobs_by_type: Dict[str, List[SendJob]] = {}
+        for row in rows:
+            try:
+                messages = load_messages(json.loads(row.messages))
+            except Exception as e:
+                logger.exception(f"[推送] 消息 {row.idem_key} 解析失败", e)
+                await RoverSignOutbox.mark_retry(
+                    row.id, row.attempts + 1, 0, repr(e), give_up=True  # type: ignore
+                )
+                continue
+            jobs_by_type.setdefault(row.board_cast_type, []).append(
+                SendJob(
+                    row.target_type,  # type: ignore
+                    row.target_id,
+                    row.bot_id,
+                    messages,
+                    row.id,
+                )
+            )
+
+        attempts = {row.id: row.attempts for row in rows}
+        for board_cast_type, jobs in jobs_by_type.items():
+            index = SubscribeIndex(await gs_subscribe.get_subscribe(board_cast_type))
+            results = await deliver_jobs(jobs, index)
+
+            sent = 0
+            now = int(time.time())
+            for i, job in enumerate(jobs):
+                assert job.outbox_id is not None
+                if i in results and results[i] is None:
+                    sent += 1
+                    continue
+                attempt = attempts[job.outbox_id] + 1
+                give_up = attempt >= OUTBOX_MAX_ATTEMPTS
+                delay = OUTBOX_RETRY_DELAY * 2 ** (attempt - 1)
+                await RoverSignOutbox.mark_retry(
+                    job.outbox_id,
+                    attempt,
+                    now + int(delay * random.uniform(1, 1.5)),
+                    results.get(i) or "无可用bot",
+                    give_up=give_up,
+                )
+                if give_up:
+                    logger.warning(
+                        f"[推送] {job.target_type} {job.target_id} 已重试{attempt}次，放弃推送"
                     )
-        except Exception as e:
-            logger.exception(f"[推送] 群 {gid} 推送失败!错误信息", e)
-        await asyncio.sleep(0.5 + random.randint(1, 3))
-    logger.info(f"[推送] {board_cast_type} 群聊推送完成!")
-    logger.info(f"[推送] {board_cast_type} 任务结束!")
+            logger.info(f"[推送] {board_cast_type} 推送成功 {sent}/{len(jobs)} 条")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._event.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._event.clear()
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.exception("[推送] 推送队列投递异常", e)
+
+    async def start(self):
+        await RoverSignOutbox.reset_sending()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+broadcast_dispatcher = BroadcastDispatcher()
+
+
+@on_core_start
+async def start_broadcast_dispatcher():
+    await broadcast_dispatcher.start()
+
+
+@on_core_shutdown
+async def stop_broadcast_dispatcher():
+    await broadcast_dispatcher.stop()
+
+
+async def send_board_cast_msg(
+    msgs: BoardCastMsgDict,
+    board_cast_type: BoardcastType,
+    idem_prefix: Optional[str] = None,
+):
+    """
+    写入持久化推送队列，由后台投递
+    idem_prefix 相同的重复调用（如断点续跑）不会重复推送
+    """
+    jobs = build_send_jobs(msgs)
+    if not jobs:
+        return
+
+    # 幂等键只取决于推送目标，重跑时目标顺序或数量变化也能去重
+    idem_prefix = idem_prefix or uuid4().hex
+    merged: Dict[str, SendJob] = {}
+    for job in jobs:
+        key = f"{idem_prefix}:{job.target_type}:{job.target_id}:{job.bot_id}"
+        if key in merged:
+            job = merged[key]._replace(messages=merged[key].messages + job.messages)
+        merged[key] = job
+
+    rows = []
+    for idem_key, job in merged.items():
+        rows.append(
+            {
+                "idem_key": idem_key,
+                "board_cast_type": board_cast_type,
+                "target_type": job.target_type,
+                "target_id": job.target_id,
+                "bot_id": job.bot_id,
+                "messages": json.dumps(dump_messages(job.messages), ensure_ascii=False),
+            }
+        )
+    await RoverSignOutbox.enqueue(rows)
+    logger.info(f"[推送] {board_cast_type} 已加入推送队列 {len(rows)} 条")
+    broadcast_dispatcher.wake()
@@ -0,0 +1,154 @@
+import asyncio
+import inspect
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+_MISSING = object()
+
+
+class LoadCancelledError(Exception):
+    """加载请求被取消，等待同一 key 的其他调用方可以重试"""
+
+
+class AsyncTTLCache:
+    """带 TTL 与 LRU 淘汰的缓存，支持按 key 合并并发请求"""
+
+    def __init__(self, ttl: float, maxsize: int = 1024, negative_ttl: float = 0):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.negative_ttl = negative_ttl
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            self.misses += 1
+            return default
+
+        value, expire_at = item
+        if expire_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def invalidate_many(self, keys: Iterable[Hashable]):
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def keys(self):
+        return list(self._data.keys())
+
+    async def get_or_load(self, key: Hashable, loader, condition=lambda x: True):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        # 同一个 key 只允许一个请求在途，其余等待结果
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            # 不把取消传给其他等待方，否则会中断整个签到流程
+            future.set_exception(LoadCancelledError(repr(key)))
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 避免无人等待时出现 never retrieved 警告
+            future.exception()
+            raise
+        else:
+            if condition(value):
+                self.set(key, value)
+            elif self.negative_ttl > 0:
+                self.set(key, value, self.negative_ttl)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def info(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+
+def _make_key(value: Any) -> Hashable:
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def async_ttl_cache(
+    ttl: float,
+    condition=lambda x: True,
+    maxsize: int = 1024,
+    negative_ttl: float = 0,
+    exclude: Iterable[str] = ("self", "cls"),
+):
+    """
+    按参数缓存异步函数结果
+    condition: 满足条件的结果按 ttl 缓存，否则按 negative_ttl 缓存（为0时不缓存）
+    exclude: 不参与生成缓存 key 的参数名
+    """
+    excluded = frozenset(exclude)
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        cache = AsyncTTLCache(ttl, maxsize=maxsize, negative_ttl=negative_ttl)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(
+                (name, _make_key(value))
+                for name, value in bound.arguments.items()
+                if name not in excluded
+            )
+            return await cache.get_or_load(
+                key, lambda: func(*args, **kwargs), condition
+            )
+
+        setattr(wrapper, "cache", cache)
+        return wrapper
+
+    return decorator
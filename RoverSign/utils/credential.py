@@ -0,0 +1,97 @@
+import time
+from typing import Iterable, NamedTuple, Optional
+
+from .cache import AsyncTTLCache
+
+
+class Credential(NamedTuple):
+    did: str
+    bat: str
+
+
+class CredentialCache:
+    """
+    (uid, cookie) -> did/bat 的进程内缓存
+    WavesUser 表与其他插件共用，所以仍保留 TTL 兜底外部写入
+    """
+
+    def __init__(self, ttl: float = 1800, maxsize: int = 20000):
+        self._cache = AsyncTTLCache(ttl, maxsize=maxsize)
+
+    def get(self, uid: str, cookie: str) -> Optional[Credential]:
+        return self._cache.get((uid, cookie))
+
+    def set(
+        self, uid: str, cookie: str, did: Optional[str], bat: Optional[str]
+    ) -> Credential:
+        credential = Credential(did or "", bat or "")
+        self._cache.set((uid or "", cookie), credential)
+        return credential
+
+    def prime(self, users: Iterable):
+        """批量预热，users 为 WavesUser 列表"""
+        for user in users:
+            if not user.cookie:
+                continue
+            credential = Credential(user.did or "", user.bat or "")
+            self._cache.set((user.uid or "", user.cookie), credential)
+            # 仅按 cookie 查询时取第一条，与 select_data_by_cookie 一致
+            if self._cache.get(("", user.cookie)) is None:
+                self._cache.set(("", user.cookie), credential)
+
+    def invalidate(self, uid: str, cookie: str):
+        self._cache.invalidate_many([(uid, cookie), ("", cookie)])
+
+    def invalidate_uid(self, uid: str):
+        keys = [key for key in self._cache.keys() if key[0] == uid]
+        cookies = {cookie for _, cookie in keys}
+        self._cache.invalidate_many(keys)
+        self._cache.invalidate_many([("", cookie) for cookie in cookies])
+
+    def info(self):
+        return self._cache.info()
+
+
+credential_cache = CredentialCache()
+
+
+def get_token_health_ttl() -> int:
+    from ..roversign_config.roversign_config import RoverSignConfig
+
+    return RoverSignConfig.get_config("TokenHealthTTL").data
+
+
+class TokenHealthCache:
+    """
+    (uid, cookie) -> 最近一次 login_log/refresh_data 预检通过的时间
+    TTL 内再次签到时跳过预检；任一接口返回 token/bat 失效即作废
+    """
+
+    def __init__(self, maxsize: int = 20000):
+        self._cache = AsyncTTLCache(0, maxsize=maxsize)
+
+    def last_validated(self, uid: str, cookie: str) -> Optional[float]:
+        return self._cache.get((uid, cookie))
+
+    def is_healthy(self, uid: str, cookie: str) -> bool:
+        return self.last_validated(uid, cookie) is not None
+
+    def mark_healthy(self, uid: str, cookie: str):
+        ttl = get_token_health_ttl()
+        if ttl <= 0:
+            return
+        self._cache.set((uid, cookie), time.time(), ttl)
+
+    def invalidate(self, uid: str, cookie: str):
+        self._cache.invalidate((uid, cookie))
+
+    def invalidate_uid(self, uid: str):
+        self._cache.invalidate_many(
+            [key for key in self._cache.keys() if key[0] == uid]
+        )
+
+    def info(self):
+        return self._cache.info()
+
+
+token_health = TokenHealthCache()
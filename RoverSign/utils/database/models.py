@@ -1,12 +1,31 @@
 import asyncio
+import json
+import time
 from functools import wraps
-from typing import Any, Dict, List, Optional, Type, TypeVar
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, Type, TypeVar
 
 from pydantic import BaseModel
-from sqlalchemy import delete, null, update
+from sqlalchemy import (
+    Column,
+    Index,
+    Text,
+    UniqueConstraint,
+    and_,
+    case,
+    delete,
+    func,
+    inspect,
+    null,
+    or_,
+    text,
+    update,
+)
+from sqlalchemy.dialects.mysql import LONGTEXT
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Field, col, select
 
+from gsuid_core.logger import logger
+from gsuid_core.server import on_core_start
 from gsuid_core.utils.database.base_models import (
     BaseIDModel,
     Bind,
@@ -14,6 +33,7 @@ from gsuid_core.utils.database.base_models import (
     with_session,
 )
 
+from ..credential import credential_cache, token_health
 from ..util import get_today_date
 
 # 创建一个全局的数据库写锁
@@ -29,9 +49,32 @@ def with_lock(func):
     return wrapper
 
 
+async def create_missing_indexes(session: AsyncSession, table) -> List[str]:
+    """
+    按索引名检查表上声明的索引，旧库缺失的按当前数据库方言建立
+    建表时已带上的索引不会重复执行
+    """
+
+    def create(sync_conn) -> List[str]:
+        existing = {i["name"] for i in inspect(sync_conn).get_indexes(table.name)}
+        created = []
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(sync_conn)
+                created.append(index.name)
+        return created
+
+    conn = await session.connection()
+    return await conn.run_sync(create)
+
+
 T_WavesBind = TypeVar("T_WavesBind", bound="WavesBind")
 T_WavesUser = TypeVar("T_WavesUser", bound="WavesUser")
 T_RoverSign = TypeVar("T_RoverSign", bound="RoverSign")
+T_RoverSignOutbox = TypeVar("T_RoverSignOutbox", bound="RoverSignOutbox")
+T_RoverSignRun = TypeVar("T_RoverSignRun", bound="RoverSignRun")
+T_RoverSignRunItem = TypeVar("T_RoverSignRunItem", bound="RoverSignRunItem")
+T_RoverSignBatToken = TypeVar("T_RoverSignBatToken", bound="RoverSignBatToken")
 
 
 class WavesBind(Bind, table=True):
@@ -40,7 +83,11 @@ class WavesBind(Bind, table=True):
 
 
 class WavesUser(User, table=True):
-    __table_args__: Dict[str, Any] = {"extend_existing": True}
+    __table_args__: Tuple[Any, ...] = (
+        Index("ix_wavesuser_cookie_uid", "cookie", "uid"),
+        Index("ix_wavesuser_user_id_uid_bot_id", "user_id", "uid", "bot_id"),
+        {"extend_existing": True},
+    )
     cookie: str = Field(default="", title="Cookie")
     uid: str = Field(default=None, title="鸣潮UID")
     record_id: Optional[str] = Field(default=None, title="鸣潮记录ID")
@@ -50,6 +97,14 @@ class WavesUser(User, table=True):
     bat: str = Field(default="", title="bat")
     did: str = Field(default="", title="did")
 
+    @classmethod
+    @with_lock
+    @with_session
+    async def ensure_indexes(
+        cls: Type[T_WavesUser], session: AsyncSession
+    ) -> List[str]:
+        return await create_missing_indexes(session, cls.__table__)  # type: ignore
+
     @classmethod
     @with_lock
     @with_session
@@ -63,8 +118,17 @@ class WavesUser(User, table=True):
             .values(status=mark)
         )
         await session.execute(sql)
+        credential_cache.invalidate(uid, cookie)
+        token_health.invalidate(uid, cookie)
         return True
 
+    @classmethod
+    async def update_data_by_uid(cls, uid: str, bot_id: str, *args, **kwargs):
+        result = await super().update_data_by_uid(uid, bot_id, *args, **kwargs)
+        credential_cache.invalidate_uid(uid)
+        token_health.invalidate_uid(uid)
+        return result
+
     @classmethod
     @with_session
     async def select_cookie(
@@ -139,6 +203,44 @@ class WavesUser(User, table=True):
         data = result.scalars().all()
         return list(data)
 
+    @classmethod
+    @with_session
+    async def get_waves_unsigned_user(
+        cls: Type[T_WavesUser],
+        session: AsyncSession,
+        date: Optional[str] = None,
+    ) -> List[T_WavesUser]:
+        """
+        获取有cookie且指定日期游戏签到或社区任务未完成的玩家
+        """
+        from .states import SignStatus
+
+        date = date or get_today_date()
+        sql = (
+            select(cls)
+            .outerjoin(
+                RoverSign,
+                and_(col(RoverSign.uid) == col(cls.uid), col(RoverSign.date) == date),
+            )
+            .where(cls.cookie != null())
+            .where(cls.cookie != "")
+            .where(cls.user_id != null())
+            .where(cls.user_id != "")
+            .where(
+                or_(
+                    col(RoverSign.id).is_(None),
+                    col(RoverSign.game_sign) != SignStatus.GAME_SIGN,
+                    col(RoverSign.bbs_sign) != SignStatus.BBS_SIGN,
+                    col(RoverSign.bbs_detail) != SignStatus.BBS_DETAIL,
+                    col(RoverSign.bbs_like) != SignStatus.BBS_LIKE,
+                    col(RoverSign.bbs_share) != SignStatus.BBS_SHARE,
+                )
+            )
+        )
+        result = await session.execute(sql)
+        data = result.scalars().all()
+        return list(data)
+
     @classmethod
     @with_session
     async def select_data_by_cookie_and_uid(
@@ -150,6 +252,10 @@ class WavesUser(User, table=True):
         return data[0] if data else None
 
 
+SIGN_FIELDS = ("game_sign", "bbs_sign", "bbs_detail", "bbs_like", "bbs_share")
+UPSERT_CHUNK_SIZE = 100
+
+
 class RoverSignData(BaseModel):
     uid: str  # 鸣潮UID
     date: Optional[str] = None  # 签到日期
@@ -183,7 +289,11 @@ class RoverSignData(BaseModel):
 
 
 class RoverSign(BaseIDModel, table=True):
-    __table_args__: Dict[str, Any] = {"extend_existing": True}
+    __table_args__: Tuple[Any, ...] = (
+        UniqueConstraint("uid", "date", name="uq_roversign_uid_date"),
+        Index("ix_roversign_date", "date"),
+        {"extend_existing": True},
+    )
     uid: str = Field(title="鸣潮UID")
     game_sign: int = Field(default=0, title="游戏签到")
     bbs_sign: int = Field(default=0, title="社区签到")
@@ -192,6 +302,87 @@ class RoverSign(BaseIDModel, table=True):
     bbs_share: int = Field(default=0, title="社区分享")
     date: str = Field(default=get_today_date(), title="签到日期")
 
+    # 唯一索引不可用时 upsert 会失败，改为逐条查询后写入
+    _upsert_ready: ClassVar[bool] = True
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def ensure_indexes(
+        cls: Type[T_RoverSign], session: AsyncSession
+    ) -> List[str]:
+        return await create_missing_indexes(session, cls.__table__)  # type: ignore
+
+    @classmethod
+    async def ensure_unique_index(cls) -> bool:
+        """启动时检查 (uid, date) 唯一索引，缺失时合并重复记录后建立"""
+        try:
+            await cls._create_unique_index()
+        except Exception as e:
+            cls._upsert_ready = False
+            logger.exception(
+                "[RoverSign] 签到表 (uid, date) 唯一索引建立失败，签到数据改为逐条写入",
+                e,
+            )
+        else:
+            cls._upsert_ready = True
+        return cls._upsert_ready
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def _create_unique_index(cls: Type[T_RoverSign], session: AsyncSession):
+        table_name = cls.__tablename__
+
+        def has_unique_index(sync_conn) -> bool:
+            inspector = inspect(sync_conn)
+            columns = [
+                c["column_names"] for c in inspector.get_unique_constraints(table_name)
+            ]
+            columns += [
+                i["column_names"]
+                for i in inspector.get_indexes(table_name)
+                if i.get("unique")
+            ]
+            return any(set(c) == {"uid", "date"} for c in columns)
+
+        conn = await session.connection()
+        if await conn.run_sync(has_unique_index):
+            return
+
+        # 重复记录按字段取最大值合并到最早的一条，不丢失当天已完成的进度
+        sql = (
+            select(
+                cls.uid,
+                cls.date,
+                func.min(cls.id),
+                *(func.max(getattr(cls, field)) for field in SIGN_FIELDS),
+            )
+            .group_by(cls.uid, cls.date)
+            .having(func.count() > 1)
+        )
+        duplicates = (await session.execute(sql)).all()
+        for uid, date, keep_id, *values in duplicates:
+            await session.execute(
+                update(cls)
+                .where(col(cls.id) == keep_id)
+                .values(**dict(zip(SIGN_FIELDS, values)))
+            )
+            await session.execute(
+                delete(cls)
+                .where(col(cls.uid) == uid)
+                .where(col(cls.date) == date)
+                .where(col(cls.id) != keep_id)
+            )
+        if duplicates:
+            logger.info(f"[RoverSign] 已合并重复的签到记录 {len(duplicates)} 组")
+
+        await session.execute(
+            text(
+                f"CREATE UNIQUE INDEX uq_roversign_uid_date ON {table_name} (uid, date)"
+            )
+        )
+
     @classmethod
     async def _find_sign_record(
         cls: Type[T_RoverSign],
@@ -204,48 +395,96 @@ class RoverSign(BaseIDModel, table=True):
         result = await session.execute(query)
         return result.scalars().first()
 
+    @classmethod
+    def _build_upsert(cls, dialect: str, rows: List[Dict[str, Any]]):
+        """构造原生 upsert 语句，冲突时各字段只增不减"""
+        table = cls.__table__  # type: ignore
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+            stmt = mysql_insert(table).values(rows)
+            incoming = stmt.inserted
+            return stmt.on_duplicate_key_update(
+                {
+                    field: case(
+                        (incoming[field] > table.c[field], incoming[field]),
+                        else_=table.c[field],
+                    )
+                    for field in SIGN_FIELDS
+                }
+            )
+
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+            stmt = pg_insert(table).values(rows)
+        else:
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+            stmt = sqlite_insert(table).values(rows)
+
+        incoming = stmt.excluded
+        return stmt.on_conflict_do_update(
+            index_elements=["uid", "date"],
+            set_={
+                field: case(
+                    (incoming[field] > table.c[field], incoming[field]),
+                    else_=table.c[field],
+                )
+                for field in SIGN_FIELDS
+            },
+        )
+
     @classmethod
     @with_lock
     @with_session
-    async def upsert_rover_sign(
+    async def bulk_upsert_rover_sign(
         cls: Type[T_RoverSign],
         session: AsyncSession,
-        rover_sign_data: RoverSignData,
-    ) -> Optional[T_RoverSign]:
+        rover_sign_datas: List[RoverSignData],
+    ) -> int:
         """
-        插入或更新签到数据
-        返回更新后的记录或新插入的记录
+        批量插入或更新签到数据
+        同一 (uid, date) 已存在时各字段取较大值，不会回退已完成的状态
         """
-        if not rover_sign_data.uid:
-            return None
-
-        # 确保日期有值
-        rover_sign_data.date = rover_sign_data.date or get_today_date()
+        rows = []
+        for rover_sign_data in rover_sign_datas:
+            if not rover_sign_data.uid:
+                continue
+            row = {
+                "uid": rover_sign_data.uid,
+                "date": rover_sign_data.date or get_today_date(),
+            }
+            for field in SIGN_FIELDS:
+                row[field] = getattr(rover_sign_data, field) or 0
+            rows.append(row)
+
+        if not rows:
+            return 0
+
+        if not cls._upsert_ready:
+            for row in rows:
+                record = await cls._find_sign_record(session, row["uid"], row["date"])
+                if record is None:
+                    session.add(cls(**row))
+                    continue
+                for field in SIGN_FIELDS:
+                    setattr(record, field, max(getattr(record, field) or 0, row[field]))
+            return len(rows)
+
+        dialect = session.get_bind().dialect.name
+        for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            stmt = cls._build_upsert(dialect, rows[i : i + UPSERT_CHUNK_SIZE])
+            await session.execute(stmt)
+        return len(rows)
 
-        # 查询是否存在记录
-        record = await cls._find_sign_record(
-            session, rover_sign_data.uid, rover_sign_data.date
-        )
-
-        if record:
-            # 更新已有记录
-            for field in [
-                "game_sign",
-                "bbs_sign",
-                "bbs_detail",
-                "bbs_like",
-                "bbs_share",
-            ]:
-                value = getattr(rover_sign_data, field)
-                if value:
-                    setattr(record, field, value)
-            result = record
-        else:
-            # 添加新记录 - 直接从Pydantic模型创建SQLModel实例
-            result = cls(**rover_sign_data.model_dump())
-            session.add(result)
-
-        return result
+    @classmethod
+    async def upsert_rover_sign(
+        cls: Type[T_RoverSign],
+        rover_sign_data: RoverSignData,
+    ) -> bool:
+        """插入或更新单条签到数据"""
+        return bool(await cls.bulk_upsert_rover_sign([rover_sign_data]))
 
     @classmethod
     @with_session
@@ -272,6 +511,15 @@ class RoverSign(BaseIDModel, table=True):
         result = await session.execute(sql)
         return list(result.scalars().all())
 
+    @classmethod
+    async def get_sign_data_map(
+        cls: Type[T_RoverSign],
+        date: Optional[str] = None,
+    ) -> Dict[str, T_RoverSign]:
+        """一次查询指定日期全部签到数据，返回 uid -> 签到数据"""
+        datas = await cls.get_all_sign_data_by_date(date)
+        return {data.uid: data for data in datas}
+
     @classmethod
     @with_lock
     @with_session
@@ -283,3 +531,421 @@ class RoverSign(BaseIDModel, table=True):
         """清除签到记录"""
         sql = delete(cls).where(getattr(cls, "date") <= date)
         await session.execute(sql)
+
+
+class OutboxStatus:
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class RoverSignOutbox(BaseIDModel, table=True):
+    __table_args__: Tuple[Any, ...] = (
+        UniqueConstraint("idem_key", name="uq_roversignoutbox_idem_key"),
+        Index("ix_roversignoutbox_status_next_retry", "status", "next_retry_at"),
+        {"extend_existing": True},
+    )
+    idem_key: str = Field(title="幂等键")
+    board_cast_type: str = Field(default="", title="推送类型")
+    target_type: str = Field(default="", title="推送目标类型")
+    target_id: str = Field(default="", title="推送目标")
+    bot_id: str = Field(default="", title="BotID")
+    messages: str = Field(
+        default="[]",
+        sa_column=Column(Text().with_variant(LONGTEXT(), "mysql")),
+        title="消息内容",
+    )
+    status: str = Field(default=OutboxStatus.PENDING, title="推送状态")
+    attempts: int = Field(default=0, title="已尝试次数")
+    next_retry_at: int = Field(default=0, title="下次推送时间")
+    last_error: str = Field(default="", sa_column=Column(Text), title="最近错误")
+    created_at: int = Field(default=0, title="创建时间")
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def ensure_long_text(
+        cls: Type[T_RoverSignOutbox], session: AsyncSession
+    ) -> bool:
+        """MySQL 的 TEXT 只有 64KB，放不下 base64 编码的签到图片，旧表改为 LONGTEXT"""
+        if session.get_bind().dialect.name != "mysql":
+            return False
+        table_name = cls.__tablename__
+
+        def get_type(sync_conn) -> str:
+            for column in inspect(sync_conn).get_columns(table_name):
+                if column["name"] == "messages":
+                    return str(column["type"]).upper()
+            return ""
+
+        conn = await session.connection()
+        column_type = await conn.run_sync(get_type)
+        if not column_type or column_type.startswith("LONGTEXT"):
+            return False
+        await session.execute(
+            text(f"ALTER TABLE {table_name} MODIFY messages LONGTEXT")
+        )
+        return True
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def enqueue(
+        cls: Type[T_RoverSignOutbox],
+        session: AsyncSession,
+        rows: List[Dict[str, Any]],
+    ) -> int:
+        """写入待推送消息，幂等键重复的消息直接忽略"""
+        if not rows:
+            return 0
+        now = int(time.time())
+        rows = [
+            {
+                "status": OutboxStatus.PENDING,
+                "attempts": 0,
+                "next_retry_at": now,
+                "last_error": "",
+                "created_at": now,
+                **row,
+            }
+            for row in rows
+        ]
+        table = cls.__table__  # type: ignore
+        dialect = session.get_bind().dialect.name
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+            stmt = mysql_insert(table).values(rows).prefix_with("IGNORE")
+        elif dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+            stmt = pg_insert(table).values(rows).on_conflict_do_nothing()
+        else:
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+            stmt = sqlite_insert(table).values(rows).on_conflict_do_nothing()
+        await session.execute(stmt)
+        return len(rows)
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def claim_due(
+        cls: Type[T_RoverSignOutbox],
+        session: AsyncSession,
+        limit: int = 100,
+    ) -> List[T_RoverSignOutbox]:
+        """取出到期的待推送消息并标记为推送中"""
+        sql = (
+            select(cls)
+            .where(cls.status == OutboxStatus.PENDING)
+            .where(cls.next_retry_at <= int(time.time()))
+            .order_by(col(cls.id))
+            .limit(limit)
+        )
+        result = await session.execute(sql)
+        data = list(result.scalars().all())
+        if data:
+            await session.execute(
+                update(cls)
+                .where(col(cls.id).in_([i.id for i in data]))
+                .values(status=OutboxStatus.SENDING)
+            )
+        return data
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def mark_sent(
+        cls: Type[T_RoverSignOutbox],
+        session: AsyncSession,
+        ids: List[int],
+    ):
+        if not ids:
+            return
+        await session.execute(
+            update(cls).where(col(cls.id).in_(ids)).values(status=OutboxStatus.SENT)
+        )
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def mark_retry(
+        cls: Type[T_RoverSignOutbox],
+        session: AsyncSession,
+        id: int,
+        attempts: int,
+        next_retry_at: int,
+        error: str,
+        give_up: bool = False,
+    ):
+        await session.execute(
+            update(cls)
+            .where(col(cls.id) == id)
+            .values(
+                status=OutboxStatus.FAILED if give_up else OutboxStatus.PENDING,
+                attempts=attempts,
+                next_retry_at=next_retry_at,
+                last_error=error,
+            )
+        )
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def reset_sending(
+        cls: Type[T_RoverSignOutbox],
+        session: AsyncSession,
+    ):
+        """重启后把上次未推送完成的消息恢复为待推送"""
+        await session.execute(
+            update(cls)
+            .where(cls.status == OutboxStatus.SENDING)
+            .values(status=OutboxStatus.PENDING)
+        )
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def clear_outbox(
+        cls: Type[T_RoverSignOutbox],
+        session: AsyncSession,
+        before: int,
+    ):
+        """清除已结束的推送记录"""
+        sql = (
+            delete(cls)
+            .where(col(cls.status).in_([OutboxStatus.SENT, OutboxStatus.FAILED]))
+            .where(cls.created_at < before)
+        )
+        await session.execute(sql)
+
+
+class RunStatus:
+    RUNNING = "running"
+    DONE = "done"
+
+
+class RunStep:
+    """单个账号在一次自动签到中的进度"""
+
+    FAILED = -1
+    PENDING = 0
+    GAME_SIGN = 2  # 游戏签到完成
+    BBS_TASK = 3  # 社区任务完成
+    REPORTED = 4  # 报告已写入推送队列
+
+
+class RoverSignRun(BaseIDModel, table=True):
+    __table_args__: Tuple[Any, ...] = (
+        UniqueConstraint("run_id", name="uq_roversignrun_run_id"),
+        Index("ix_roversignrun_date_status", "date", "status"),
+        {"extend_existing": True},
+    )
+    run_id: str = Field(title="执行ID")
+    date: str = Field(default="", title="签到日期")
+    status: str = Field(default=RunStatus.RUNNING, title="执行状态")
+    created_at: int = Field(default=0, title="创建时间")
+    updated_at: int = Field(default=0, title="更新时间")
+
+    @classmethod
+    @with_session
+    async def get_unfinished_run(
+        cls: Type[T_RoverSignRun],
+        session: AsyncSession,
+        date: Optional[str] = None,
+    ) -> Optional[T_RoverSignRun]:
+        """指定日期最近一次未完成的自动签到"""
+        sql = (
+            select(cls)
+            .where(cls.date == (date or get_today_date()))
+            .where(cls.status == RunStatus.RUNNING)
+            .order_by(col(cls.id).desc())
+        )
+        result = await session.execute(sql)
+        return result.scalars().first()
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def create_run(
+        cls: Type[T_RoverSignRun],
+        session: AsyncSession,
+        run_id: str,
+        date: str,
+    ):
+        now = int(time.time())
+        session.add(cls(run_id=run_id, date=date, created_at=now, updated_at=now))
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def finish_run(
+        cls: Type[T_RoverSignRun],
+        session: AsyncSession,
+        run_id: str,
+    ):
+        await session.execute(
+            update(cls)
+            .where(cls.run_id == run_id)
+            .values(status=RunStatus.DONE, updated_at=int(time.time()))
+        )
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def clear_run(
+        cls: Type[T_RoverSignRun],
+        session: AsyncSession,
+        date: str,
+    ):
+        """清除指定日期及之前的执行记录"""
+        await session.execute(
+            delete(RoverSignRunItem).where(col(RoverSignRunItem.date) <= date)
+        )
+        await session.execute(delete(cls).where(col(cls.date) <= date))
+
+
+class RoverSignRunItem(BaseIDModel, table=True):
+    __table_args__: Tuple[Any, ...] = (
+        UniqueConstraint("run_id", "uid", name="uq_roversignrunitem_run_id_uid"),
+        {"extend_existing": True},
+    )
+    run_id: str = Field(title="执行ID")
+    uid: str = Field(title="鸣潮UID")
+    date: str = Field(default="", title="签到日期")
+    step: int = Field(default=RunStep.PENDING, title="执行进度")
+    report: str = Field(default="{}", sa_column=Column(Text), title="报告数据")
+    error: str = Field(default="", sa_column=Column(Text), title="失败原因")
+    updated_at: int = Field(default=0, title="更新时间")
+
+    def load_report(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.report or "{}")
+        except ValueError:
+            return {}
+
+    @classmethod
+    @with_session
+    async def get_items(
+        cls: Type[T_RoverSignRunItem],
+        session: AsyncSession,
+        run_id: str,
+    ) -> Dict[str, T_RoverSignRunItem]:
+        result = await session.execute(select(cls).where(cls.run_id == run_id))
+        return {item.uid: item for item in result.scalars().all()}
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def save_step(
+        cls: Type[T_RoverSignRunItem],
+        session: AsyncSession,
+        run_id: str,
+        date: str,
+        uid: str,
+        step: int,
+        report: Dict[str, Any],
+        error: str = "",
+    ):
+        """写入账号进度检查点，同一次执行的同一账号只保留一条"""
+        values = {
+            "run_id": run_id,
+            "uid": uid,
+            "date": date,
+            "step": step,
+            "report": json.dumps(report, ensure_ascii=False),
+            "error": error,
+            "updated_at": int(time.time()),
+        }
+        update_keys = ("step", "report", "error", "updated_at")
+        table = cls.__table__  # type: ignore
+        dialect = session.get_bind().dialect.name
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+            stmt = mysql_insert(table).values(values)
+            stmt = stmt.on_duplicate_key_update(
+                **{key: stmt.inserted[key] for key in update_keys}
+            )
+        else:
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+
+            stmt = insert(table).values(values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["run_id", "uid"],
+                set_={key: stmt.excluded[key] for key in update_keys},
+            )
+        await session.execute(stmt)
+
+
+class RoverSignBatToken(BaseIDModel, table=True):
+    __table_args__: Tuple[Any, ...] = (
+        UniqueConstraint("uid", name="uq_roversignbattoken_uid"),
+        {"extend_existing": True},
+    )
+    uid: str = Field(title="鸣潮UID")
+    refreshed_at: int = Field(default=0, title="刷新时间")
+
+    @classmethod
+    @with_session
+    async def get_refreshed_map(
+        cls: Type[T_RoverSignBatToken],
+        session: AsyncSession,
+    ) -> Dict[str, int]:
+        """uid -> bat 令牌最近一次刷新时间"""
+        result = await session.execute(select(cls.uid, cls.refreshed_at))
+        return {uid: refreshed_at for uid, refreshed_at in result.all()}
+
+    @classmethod
+    @with_lock
+    @with_session
+    async def mark_refreshed(
+        cls: Type[T_RoverSignBatToken],
+        session: AsyncSession,
+        uid: str,
+        refreshed_at: int,
+    ):
+        values = {"uid": uid, "refreshed_at": refreshed_at}
+        table = cls.__table__  # type: ignore
+        dialect = session.get_bind().dialect.name
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+            stmt = mysql_insert(table).values(values)
+            stmt = stmt.on_duplicate_key_update(refreshed_at=stmt.inserted.refreshed_at)
+        else:
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+
+            stmt = insert(table).values(values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["uid"],
+                set_={"refreshed_at": stmt.excluded.refreshed_at},
+            )
+        await session.execute(stmt)
+
+
+@on_core_start
+async def migrate_database():
+    """旧库升级时补建索引、调整字段类型"""
+    for model in (WavesUser, RoverSign):
+        try:
+            created = await model.ensure_indexes()
+        except Exception as e:
+            logger.exception(f"[RoverSign] {model.__tablename__} 索引建立失败", e)
+            continue
+        if created:
+            logger.info(f"[RoverSign] {model.__tablename__} 已建立索引: {created}")
+
+    try:
+        if await RoverSignOutbox.ensure_long_text():
+            logger.info("[RoverSign] 推送队列消息字段已改为 LONGTEXT")
+    except Exception as e:
+        logger.exception("[RoverSign] 推送队列消息字段修改失败", e)
@@ -0,0 +1,127 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple, Union
+
+from gsuid_core.logger import logger
+from gsuid_core.server import on_core_shutdown, on_core_start
+
+from ..util import get_today_date
+from .models import SIGN_FIELDS, RoverSign, RoverSignData
+
+
+def _merge_field(old: Optional[int], new: Optional[int]) -> Optional[int]:
+    if old is None:
+        return new
+    if new is None:
+        return old
+    return max(old, new)
+
+
+class SignWriteBuffer:
+    """
+    RoverSign 写缓冲
+    按 (uid, date) 合并状态变更，达到数量或时间阈值时批量 upsert 落库
+    """
+
+    def __init__(self, max_size: int = 100, flush_interval: float = 3):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._pending: Dict[Tuple[str, str], RoverSignData] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _merge(self, data: RoverSignData):
+        key = (data.uid, data.date or get_today_date())
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = RoverSignData(
+                uid=key[0],
+                date=key[1],
+                **{field: getattr(data, field) for field in SIGN_FIELDS},
+            )
+            return
+        for field in SIGN_FIELDS:
+            setattr(
+                pending,
+                field,
+                _merge_field(getattr(pending, field), getattr(data, field)),
+            )
+
+    async def put(self, data: Union[RoverSign, RoverSignData]):
+        if not data.uid:
+            return
+        if not isinstance(data, RoverSignData):
+            data = RoverSignData(
+                uid=data.uid,
+                date=data.date,
+                **{field: getattr(data, field) for field in SIGN_FIELDS},
+            )
+        self._merge(data)
+        if len(self._pending) >= self.max_size:
+            await self.flush()
+
+    def overlay(
+        self, uid: str, date: str, record: Optional[RoverSign]
+    ) -> Optional[RoverSign]:
+        """把尚未落库的变更合并到查询结果上"""
+        pending = self._pending.get((uid, date))
+        if pending is None:
+            return record
+        if record is None:
+            record = RoverSign(uid=uid, date=date)
+        for field in SIGN_FIELDS:
+            value = _merge_field(getattr(record, field), getattr(pending, field))
+            setattr(record, field, value or 0)
+        return record
+
+    async def get_sign_data(
+        self, uid: str, date: Optional[str] = None
+    ) -> Optional[RoverSign]:
+        date = date or get_today_date()
+        record = await RoverSign.get_sign_data(uid, date)
+        return self.overlay(uid, date, record)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch: List[RoverSignData] = list(self._pending.values())
+            self._pending = {}
+            try:
+                num = await RoverSign.bulk_upsert_rover_sign(batch)
+                logger.debug(f"[RoverSign] 签到数据批量写入 {num} 条")
+            except Exception as e:
+                logger.exception("[RoverSign] 签到数据批量写入失败，稍后重试", e)
+                for data in batch:
+                    self._merge(data)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+sign_buffer = SignWriteBuffer()
+
+
+@on_core_start
+async def start_sign_buffer():
+    await RoverSign.ensure_unique_index()
+    sign_buffer.start()
+
+
+@on_core_shutdown
+async def stop_sign_buffer():
+    await sign_buffer.stop()
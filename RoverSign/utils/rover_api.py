@@ -1,3 +1,22 @@
+from gsuid_core.aps import scheduler
+from gsuid_core.server import on_core_shutdown, on_core_start
+
 from ..utils.api.requests import RoverRequest
 
 rover_api = RoverRequest()
+
+
+@on_core_start
+async def start_rover_api():
+    await rover_api.start()
+
+
+@on_core_shutdown
+async def close_rover_api():
+    await rover_api.close()
+
+
+@scheduler.scheduled_job("interval", hours=1)
+async def refresh_rover_header_template():
+    """定时刷新出口IP"""
+    await rover_api.refresh_header_template()
@@ -1,63 +1,26 @@
-import asyncio
 import random
 import string
-import time
 from datetime import datetime, timedelta
-from functools import wraps
+from typing import Optional
 
 import httpx
 
 from gsuid_core.logger import logger
 
+from .cache import async_ttl_cache
 
-def timed_async_cache(expiration, condition=lambda x: True):
-    def decorator(func):
-        cache = {}
-        locks = {}
-
-        @wraps(func)
-        async def wrapper(*args):
-            current_time = time.time()
-            # 如果是类方法，args[0]是实例，我们获取类名
-            if args and hasattr(args[0], "__class__"):
-                cache_key = f"{args[0].__class__.__name__}.{func.__name__}"
-            else:
-                cache_key = func.__name__
-
-            # 为每个缓存键创建一个锁
-            if cache_key not in locks:
-                locks[cache_key] = asyncio.Lock()
-
-            # 检查缓存，如果有效则直接返回
-            if cache_key in cache:
-                value, timestamp = cache[cache_key]
-                if current_time - timestamp < expiration:
-                    return value
-
-            # 获取锁以确保并发安全
-            async with locks[cache_key]:
-                # 双重检查，避免等待锁期间其他协程已经更新了缓存
-                if cache_key in cache:
-                    value, timestamp = cache[cache_key]
-                    if current_time - timestamp < expiration:
-                        return value
-
-                # 执行原始函数
-                value = await func(*args)
-                if condition(value):
-                    cache[cache_key] = (value, current_time)
-                return value
-
-        return wrapper
-
-    return decorator
-
-
-# 使用示例
-@timed_async_cache(86400)
-async def get_public_ip(host="127.127.127.127"):
+DEFAULT_PUBLIC_IP = "127.127.127.127"
+
+
+@async_ttl_cache(
+    86400,
+    lambda ip: bool(ip) and ip != DEFAULT_PUBLIC_IP,
+    maxsize=16,
+    negative_ttl=300,
+)
+async def get_public_ip(host=DEFAULT_PUBLIC_IP, proxy: Optional[str] = None):
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(proxy=proxy) as client:
             r = await client.get("https://event.kurobbs.com/event/ip", timeout=4)
             ip = r.text
             return ip
@@ -67,7 +30,7 @@ async def get_public_ip(host="127.127.127.127"):
 
     # 尝试从 ipify 获取 IP 地址
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(proxy=proxy) as client:
             r = await client.get("https://api.ipify.org/?format=json", timeout=4)
             ip = r.json()["ip"]
             return ip
@@ -76,7 +39,7 @@ async def get_public_ip(host="127.127.127.127"):
 
     # 尝试从 httpbin.org 获取 IP 地址
     try:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(proxy=proxy) as client:
             r = await client.get("https://httpbin.org/ip", timeout=4)
             ip = r.json()["origin"]
             return ip
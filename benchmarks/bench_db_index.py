@@ -0,0 +1,100 @@
+"""
+RoverSign / WavesUser 热点查询在建立索引前后的耗时对比
+
+    python benchmarks/bench_db_index.py [行数]
+
+使用内存 SQLite 复刻表结构，索引与 utils/database/models.py 中声明的索引保持一致。
+"""
+
+import random
+import sqlite3
+import sys
+import time
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+LOOKUPS = 2_000
+DATES = ["2026-10-16", "2026-10-17", "2026-10-18"]
+
+INDEXES = [
+    "CREATE UNIQUE INDEX uq_roversign_uid_date ON roversign (uid, date)",
+    "CREATE INDEX ix_roversign_date ON roversign (date)",
+    "CREATE INDEX ix_wavesuser_cookie_uid ON wavesuser (cookie, uid)",
+    "CREATE INDEX ix_wavesuser_user_id_uid_bot_id ON wavesuser (user_id, uid, bot_id)",
+]
+
+QUERIES = {
+    "RoverSign (uid, date)": (
+        "SELECT * FROM roversign WHERE uid = ? AND date = ?",
+        lambda i: (f"1{i:08d}", DATES[-1]),
+    ),
+    "WavesUser (cookie, uid)": (
+        "SELECT * FROM wavesuser WHERE cookie = ? AND uid = ?",
+        lambda i: (f"cookie-{i}", f"1{i:08d}"),
+    ),
+    "WavesUser (cookie)": (
+        "SELECT * FROM wavesuser WHERE cookie = ?",
+        lambda i: (f"cookie-{i}",),
+    ),
+    "WavesUser (user_id, uid, bot_id)": (
+        "SELECT * FROM wavesuser WHERE user_id = ? AND uid = ? AND bot_id = ?",
+        lambda i: (f"qq{i}", f"1{i:08d}", "onebot"),
+    ),
+}
+
+
+def build_db() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE roversign (
+            id INTEGER PRIMARY KEY, uid TEXT, game_sign INTEGER, bbs_sign INTEGER,
+            bbs_detail INTEGER, bbs_like INTEGER, bbs_share INTEGER, date TEXT
+        );
+        CREATE TABLE wavesuser (
+            id INTEGER PRIMARY KEY, bot_id TEXT, user_id TEXT, uid TEXT,
+            cookie TEXT, did TEXT, bat TEXT, status TEXT
+        );
+        """)
+    users = ROWS // len(DATES)
+    conn.executemany(
+        "INSERT INTO roversign (uid, game_sign, bbs_sign, bbs_detail, bbs_like, "
+        "bbs_share, date) VALUES (?, 1, 1, 3, 5, 1, ?)",
+        ((f"1{i:08d}", date) for date in DATES for i in range(users)),
+    )
+    conn.executemany(
+        "INSERT INTO wavesuser (bot_id, user_id, uid, cookie, did, bat, status) "
+        "VALUES ('onebot', ?, ?, ?, '', '', '')",
+        ((f"qq{i}", f"1{i:08d}", f"cookie-{i}") for i in range(ROWS)),
+    )
+    conn.commit()
+    return conn
+
+
+def run_queries(conn: sqlite3.Connection) -> dict:
+    users = ROWS // len(DATES)
+    samples = [random.randrange(users) for _ in range(LOOKUPS)]
+    result = {}
+    for name, (sql, params) in QUERIES.items():
+        start = time.perf_counter()
+        for i in samples:
+            conn.execute(sql, params(i)).fetchall()
+        result[name] = (time.perf_counter() - start) / LOOKUPS * 1e6
+    return result
+
+
+def main():
+    random.seed(0)
+    conn = build_db()
+    before = run_queries(conn)
+    for sql in INDEXES:
+        conn.execute(sql)
+    after = run_queries(conn)
+
+    print(f"rows: {ROWS}  lookups: {LOOKUPS}")
+    print(f"{'query':<36}{'before(us)':>12}{'after(us)':>12}{'speedup':>10}")
+    for name in QUERIES:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<36}{before[name]:>12.1f}{after[name]:>12.1f}{speedup:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()